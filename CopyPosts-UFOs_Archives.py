@@ -1,20 +1,39 @@
 import praw
-import requests
 import os
-import time
 import logging
-import sys
+import argparse
+import asyncio
 import re
+import time
+import signal
+import collections
 from datetime import datetime, timedelta, timezone
+from prawcore import Requestor
 from prawcore.exceptions import RequestException, ResponseException
 from praw.exceptions import RedditAPIException
 import config  # Import the config file with credentials
-import subprocess
 import shutil
-
-# Set up logging
-logging.basicConfig(filename='/home/ubuntu/Reddit-UFOs_Archive/error_log.txt', level=logging.ERROR, 
-                    format='%(asctime)s %(levelname)s: %(message)s')
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from media_download import cleanup_stale_partials
+from media_resolver import snapshot_submission
+from rate_limiter import RedditRateLimiter
+from state_store import StateStore
+from flair_cache import FlairTemplateCache
+from media_jobs import cleanup_stale_jobs
+from media_cache import MediaCache
+from duplicate_index import DuplicateIndex, DUPLICATE_ACTION
+from media_prepare import MediaPreparer
+from archive_post import build_comment, split_text, submission_request, record_duplicate, record_archive
+from structured_log import setup_logging, start_trace, traced, timed, finish_trace
+import metrics  # Prometheus textfile / HTTP metrics
+import settings  # Optional config.py values
+from settings import ARCHIVE_DIR  # Folder for state, logs, caches and temp media
+
+# Set up logging: readable errors for Discord, plus JSON lines with per-post trace IDs and stage timings.
+# Levels come from ARCHIVE_LOG_LEVEL / ARCHIVE_ERROR_LOG_LEVEL or config.py, see structured_log
+setup_logging(os.path.join(ARCHIVE_DIR, "error_log.txt"), json_log=os.path.join(ARCHIVE_DIR, "pipeline_log.jsonl"))
 
 # Reddit API credentials
 source_reddit = praw.Reddit(
@@ -22,7 +41,8 @@ source_reddit = praw.Reddit(
     client_secret=config.source_client_secret,
     password=config.source_password,
     username=config.source_username,
-    user_agent=config.source_user_agent
+    user_agent=config.source_user_agent,
+    requestor_class=metrics.counting_requestor(Requestor, "source")
 )
 
 archives_reddit = praw.Reddit(
@@ -30,71 +50,76 @@ archives_reddit = praw.Reddit(
     client_secret=config.destination_client_secret,
     password=config.destination_password,
     username=config.destination_username,
-    user_agent=config.destination_user_agent
+    user_agent=config.destination_user_agent,
+    ratelimit_seconds=300,  # Let PRAW wait out "doing that too much" on submissions instead of failing
+    requestor_class=metrics.counting_requestor(Requestor, "archive")
 )
 
 # Subreddits
 source_subreddit = source_reddit.subreddit('ufos')
 destination_subreddit = archives_reddit.subreddit('UFOs_Archive')
 
-# File to store processed post IDs
-PROCESSED_FILE = "/home/ubuntu/Reddit-UFOs_Archive/processed_posts.txt"
+# Shared API budget for both accounts, driven by Reddit's rate limit headers
+rate_limiter = RedditRateLimiter(source_reddit, archives_reddit)
+
+# Shared state database (processed posts, archive IDs, listing cursor)
+STATE_DB = os.path.join(ARCHIVE_DIR, "archive_state.db")
+
+# Destination flair templates cached between runs
+FLAIR_CACHE_FILE = os.path.join(ARCHIVE_DIR, "flair_templates.json")
 
-# Max IDs to store in previous file
-MAX_PROCESSED_IDS = 2000
+# Old flat file of processed post IDs, imported into the state database once
+PROCESSED_FILE = os.path.join(ARCHIVE_DIR, "processed_posts.txt")
 
-# Specify temp media location
-MEDIA_DOWNLOAD_DIR = "/home/ubuntu/Reddit-UFOs_Archive/temp_media"
+# How far below the last run's cursor the /new scan still looks. Posts a mod approves late keep
+# their original place in /new, under posts that were already listed
+LATE_APPROVAL_LOOKBACK = 10 * 60
+
+# Specify temp media location, each post gets its own work directory inside it
+MEDIA_DOWNLOAD_DIR = os.path.join(ARCHIVE_DIR, "temp_media")
 os.makedirs(MEDIA_DOWNLOAD_DIR, exist_ok=True)
 
-# Start definitions
-def load_processed_posts():
-    if os.path.exists(PROCESSED_FILE):
-        with open(PROCESSED_FILE, "r") as file:
-            return set(file.read().splitlines())
-    return set()
-
-def save_processed_post(post_id):
-    with open(PROCESSED_FILE, "a") as file:
-        file.write(post_id + "\n")
-
-def download_media(url, file_name):
-    if "preview.redd.it" in url:
-        url = url.replace("preview.redd.it", "i.redd.it")
-
-    headers = {
-        'User-Agent': 'Mozilla/5.0'
-    }
-    full_path = os.path.join(MEDIA_DOWNLOAD_DIR, file_name)
-    response = requests.get(url, stream=True, headers=headers)
-    if response.status_code == 200:
-        with open(full_path, 'wb') as out_file:
-            for chunk in response.iter_content(chunk_size=1024):
-                out_file.write(chunk)
-        return full_path
-    else:
-        logging.error(f"Failed to download media from {url}. Status code: {response.status_code}. Submission ID: {submission.id}")
-        return None
+# Interrupted downloads and their journals, resumed on retry or by the next run
+PARTIAL_DOWNLOAD_DIR = os.path.join(MEDIA_DOWNLOAD_DIR, ".partial")
+
+# Content-addressed cache of finished downloads and merges, shared across runs and reposts
+MEDIA_CACHE_DIR = os.path.join(ARCHIVE_DIR, "media_cache")
+
+# node-exporter textfile, point metrics_textfile_dir in config.py at the collector's --collector.textfile.directory
+METRICS_FILE = os.path.join(settings.get("metrics_textfile_dir", os.path.join(ARCHIVE_DIR, "metrics")), "copy_posts.prom")
+# Daemon mode: rewrite the textfile at most this often
+METRICS_FLUSH_INTERVAL = 60
+
+# Pipeline sizing: posts being downloaded/merged at once, and how far the lister may run ahead of the submitter
+PREPARE_WORKERS = 3
+PREFETCH_POSTS = 6
+
+# Daemon mode: a failed post is retried this long after failing, with the same two tries cron gave it
+DAEMON_RETRY_DELAY = 10 * 60
+DAEMON_MAX_ATTEMPTS = 2
+# Daemon mode: pause before reopening the submission stream after an error, and how often to clear stale work files
+STREAM_RESTART_DELAY = 30
+MAINTENANCE_INTERVAL = 60 * 60
+# Daemon mode: wait between polls of /new. Every poll is a request on the source (moderator) account,
+# whose budget DailyRemovedFlair.py and CopySinglePost.py share
+POLL_INTERVAL = 15
+# Daemon mode: abandoned post IDs remembered, a reopened stream replays at most 100 posts
+ABANDONED_KEEP = 100
 
-def split_text(text, max_length=10000):
-    chunks = []
-    while len(text) > max_length:
-        split_point = text.rfind("\n", 0, max_length)
-        if split_point == -1:
-            split_point = max_length
-        chunks.append(text[:split_point])
-        text = text[split_point:].lstrip()
-    chunks.append(text)
-    return chunks
-
-def get_audio_url_from_fallback(video_url):
-    """
-    Construct the new CMAF_AUDIO_64 URL from the fallback video URL. When reddit changes it again pull new url from MPD with debug script. Open in NP++
-    """
-    if not video_url:
-        return None
-    return video_url.rsplit('/', 1)[0] + "/CMAF_AUDIO_64.mp4"
+# Start definitions
+def load_listing_cursor():
+    """Returns (fullname, created_utc) of the newest post the last run finished with, or None."""
+    try:
+        value = state_store.get_meta("listing_cursor")
+        if value:
+            fullname, created_utc = value.split()
+            return fullname, float(created_utc)
+    except Exception as e:
+        logging.error(f"Failed to read listing cursor: {str(e)}")
+    return None
 
+def save_listing_cursor(cursor):
+    state_store.set_meta("listing_cursor", f"{cursor[0]} {cursor[1]}")
 
 # Parse time delta from command-line argument
 def parse_time_delta(arg):
@@ -110,279 +135,363 @@ def parse_time_delta(arg):
     elif unit == 'h':
         return timedelta(hours=value)
 
-# Get time delta from command-line argument
-time_delta = parse_time_delta(sys.argv[1] if len(sys.argv) > 1 else None)
 
-# Time filtering
-current_time = datetime.now(timezone.utc)
-cutoff_time = current_time - time_delta
+def cleanup_media(prepared):
+    prepared["job"].cleanup()
 
-processed_posts = load_processed_posts()
 
-# Start of script - Fetch new posts
-print(f"Starting script. Scan interval: {time_delta}.")
-newly_copied_post_ids = [] # count number of posts to remove old IDs from processed_posts log
-for submission in source_subreddit.new():
-    video_url = None
-    audio_url = None
-    dash_url = None
-    video_file = os.path.join(MEDIA_DOWNLOAD_DIR, 'media_video.mp4')
-    audio_file = os.path.join(MEDIA_DOWNLOAD_DIR, 'media_audio.mp4')
-    merged_file = os.path.join(MEDIA_DOWNLOAD_DIR, 'merged_video.mp4')
-    try:
-        logging.info(f"Processing submission: {submission.title}, Flair: {submission.link_flair_text}, Created: {submission.created_utc}")
-        audio_url = None
-
-        if submission.id in processed_posts:
-            continue
-
-        post_time = datetime.fromtimestamp(submission.created_utc, timezone.utc)
-        if post_time < cutoff_time:
-            continue
-
-        title = submission.title
-        is_self_post = submission.is_self
-        media_url = None
-        original_media_url = None
-        gallery_images = []
-
-        # If image gallery
-        if hasattr(submission, 'is_gallery') and submission.is_gallery:
-            for item in submission.gallery_data['items']:
-                media_id = item['media_id']
-                meta = submission.media_metadata.get(media_id, {})
-
-                # SKIP failed or invalid gallery items
-                if meta.get("status") != "valid":
-                    logging.warning(f"Skipping failed gallery item {media_id} in post {submission.id}")
-                    continue
+def listing_floor(cursor, cutoff_time):
+    """Oldest created_utc the /new scan has to reach: LATE_APPROVAL_LOOKBACK below the cursor, never past the cutoff."""
+    if cursor:
+        return max(cursor[1] - LATE_APPROVAL_LOOKBACK, cutoff_time.timestamp())
+    return cutoff_time.timestamp()
 
-                img_url = None
-                file_name = None
-
-                if meta.get('e') == 'Image' and 's' in meta and 'u' in meta['s']:
-                    # Standard image
-                    img_url = meta['s']['u'].split('?')[0]
-
-                elif meta.get('e') == 'AnimatedImage' and 's' in meta:
-                    # Handle GIFs or MP4s
-                    if 'gif' in meta['s']:
-                        img_url = meta['s']['gif']
-                    elif 'mp4' in meta['s']:
-                        img_url = meta['s']['mp4']
-
-                elif meta.get('e') == 'RedditVideo':
-                    # Handle Reddit-hosted videos in galleries (rare)
-                    dash_url = meta.get('dashUrl')
-                    if dash_url:
-                        # Try higher res streams
-                        test_urls = [
-                            dash_url.replace("DASHPlaylist.mpd", "DASH_1080.mp4"),
-                            dash_url.replace("DASHPlaylist.mpd", "DASH_720.mp4"),
-                            dash_url.replace("DASHPlaylist.mpd", "DASH_480.mp4")
-                        ]
-                        for url in test_urls:
-                            head_resp = requests.head(url, headers={'User-Agent': 'Mozilla/5.0'})
-                            if head_resp.status_code == 200:
-                                img_url = url
-                                break
-                    # Fallback to reddit_video object if available
-                    if not img_url and submission.media and 'reddit_video' in submission.media:
-                        img_url = submission.media['reddit_video'].get('fallback_url')
-
-                if img_url:
-                    ext = os.path.splitext(img_url.split("?")[0])[-1]
-                    file_name = f"{media_id}{ext}"
-                    downloaded = download_media(img_url, file_name)
-                    if downloaded:
-                        gallery_images.append(downloaded)
-
-        # Handle Reddit video from media_metadata (gallery-like or crossposted video posts)
-        elif hasattr(submission, "media_metadata") and submission.media_metadata:
-            for key, meta in submission.media_metadata.items():
-                if meta.get('e') == 'RedditVideo' and 'dashUrl' in meta:
-                    dash_url = meta['dashUrl']
-                    logging.info(f"Found dash_url: {dash_url} for post {submission.id}")
-                    test_urls = [
-                        dash_url.replace("DASHPlaylist.mpd", "DASH_1080.mp4"),
-                        dash_url.replace("DASHPlaylist.mpd", "DASH_720.mp4"),
-                        dash_url.replace("DASHPlaylist.mpd", "DASH_480.mp4")
-                    ]
-                    video_url = None
-                    for url in test_urls:
-                        head_resp = requests.head(url, headers={'User-Agent': 'Mozilla/5.0'})
-                        if head_resp.status_code == 200:
-                            video_url = url
-                            break
-
-                    # Fallback to submission.media.reddit_video.fallback_url if dashUrl fails
-                    if not video_url and submission.media and 'reddit_video' in submission.media:
-                        fallback_url = submission.media['reddit_video'].get('fallback_url')
-                        if fallback_url:
-                            logging.warning(f"dashUrl failed for {submission.id}, using fallback_url.")
-                            video_url = fallback_url
-
-                    has_audio = True
-                    is_gif = meta.get('isGif', False)
-                    original_media_url = video_url
-                    break
 
+def new_posts_listing():
+    """/new newest first, stopping at the listing floor so only the pages since the last run are fetched."""
+    floor = listing_floor(load_listing_cursor(), cutoff_time)
+    posts = []
+    for submission in source_subreddit.new(limit=None):
+        if submission.created_utc < floor:
+            break
+        posts.append(submission)
+    return posts
 
-        # Handle direct Reddit video (fallback_url)
-        elif submission.media and 'reddit_video' in submission.media:
-            reddit_video = submission.media['reddit_video']
-            video_url = reddit_video.get('fallback_url')
-            has_audio = reddit_video.get('has_audio', False)
-            is_gif = reddit_video.get('is_gif', False)
-            original_media_url = video_url
-
-            # ✅ Assign dash_url from reddit_video if present
-            dash_url = reddit_video.get('dash_url') or reddit_video.get('dashUrl')
-            logging.info(f"[DEBUG] dash_url from reddit_video: {dash_url} for post {submission.id}")
-
-        # Handle direct image
-        elif not is_self_post and submission.url.endswith(('jpg', 'jpeg', 'png', 'gif')):
-            file_name = submission.url.split('/')[-1]
-            media_url = download_media(submission.url, file_name)
-            original_media_url = submission.url
-
-        # Process video if found
-        if video_url:
-            if has_audio and not is_gif:
-                audio_url = get_audio_url_from_fallback(video_url)
-                logging.info(f"[DEBUG] Built audio_url: {audio_url} for post {submission.id}")
-                if audio_url:
-                    # Merge directly from URLs
-                    cmd = [
-                        "ffmpeg", "-loglevel", "error", "-y",
-                        "-i", video_url,
-                        "-i", audio_url,
-                        "-c", "copy",
-                        merged_file
-                    ]
-                    try:
-                        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                        media_url = merged_file
-                    except subprocess.CalledProcessError as e:
-                        logging.error(f"FFmpeg failed (URL merge) with return code {e.returncode}, falling back to video only. {submission.id}")
-                        media_url = download_media(video_url, "media_video.mp4")
-                else:
-                    media_url = download_media(video_url, "media_video.mp4")
-            else:
-                media_url = download_media(video_url, "media_video.mp4")
+
+def advance_listing_cursor(old_cursor):
+    """
+    Move the cursor up to the newest post that has everything at or below it archived.
+    A failed post holds the cursor back so the next run lists it again.
+    """
+    cursor = old_cursor
+    for fullname, created_utc, post_id in reversed(listed_posts):  # oldest first
+        if not state_store.is_processed(post_id):
+            break
+        cursor = (fullname, created_utc)
+    return cursor
 
 
-        new_post = None
-        source_flair_text = submission.link_flair_text
+def queue_post(post, prepare_pool, ready_queue):
+    start_trace(post)
+    ready_queue.put((post, prepare_pool.submit(preparer.prepare_media, post)))
 
-        # If self post
-        if is_self_post:
-            new_post = destination_subreddit.submit(title, selftext=submission.selftext)
-        elif gallery_images:
-            if len(gallery_images) >= 2:
-                images = [{'image_path': path} for path in gallery_images]
-                new_post = destination_subreddit.submit_gallery(title, images=images)
-            else:
-                # Reddit requires at least 2 images for galleries
-                single_image = gallery_images[0]
-                new_post = destination_subreddit.submit_image(
-                    title,
-                    image_path=single_image
-                )
-        elif media_url and os.path.exists(media_url) and os.path.getsize(media_url) > 0:
-            if media_url.endswith(('jpg', 'jpeg', 'png', 'gif')):
-                new_post = destination_subreddit.submit_image(title, image_path=media_url)
-            elif media_url.endswith('mp4'):
-                new_post = destination_subreddit.submit_video(title, video_path=media_url)
-        else:
-            if submission.url and submission.url.startswith("http"):
-                new_post = destination_subreddit.submit(title, url=submission.url)
-            else:
-                logging.error(
-                    f"Cannot submit post {submission.id}: missing media and invalid URL."
-                )
-                continue
-                
-        # Set post flair from source
-        if new_post and source_flair_text:
-            matching_flair = None
-            for flair in destination_subreddit.flair.link_templates:
-                if flair['text'] == source_flair_text:
-                    matching_flair = flair['id']
+
+def list_new_posts(prepare_pool, ready_queue):
+    """
+    Listing stage. Filters new submissions and hands each one to the download pool.
+    The bounded ready_queue keeps this stage at most PREFETCH_POSTS ahead of the submitter.
+    """
+    try:
+        with timed("listing"):
+            submissions = list(new_posts_listing())
+        for submission in submissions:
+            try:
+                logging.info(f"Processing submission: {submission.title}, Flair: {submission.link_flair_text}, Created: {submission.created_utc}")
+
+                # /new is newest first, everything past the cutoff is older still
+                post_time = datetime.fromtimestamp(submission.created_utc, timezone.utc)
+                if post_time < cutoff_time:
                     break
-            if matching_flair:
+
+                listed_posts.append((submission.fullname, submission.created_utc, submission.id))
+                if state_store.is_processed(submission.id):
+                    continue
+
+                queue_post(snapshot_submission(submission), prepare_pool, ready_queue)
+            except (RequestException, ResponseException, RedditAPIException) as ex:
+                logging.error(f"Error for post {submission.id}: {str(ex)}")
+            except Exception as e:
+                logging.error(f"General error for post {submission.id}: {str(e)}")
+    except Exception as e:
+        logging.error(f"Failed to list new posts: {str(e)}")
+    finally:
+        ready_queue.put(None)
+
+
+def submit_post(post, prepared):
+    """Submit stage. Posts to the archive, copies flair and leaves the info comment."""
+    source_flair_text = post["link_flair_text"]
+
+    # Self post, link to an earlier duplicate, gallery, image, video or link, same choice as async_copier
+    request = submission_request(post, prepared, destination_subreddit.display_name)
+    if not request:
+        return None
+    method, kwargs = request
+    with timed("submit"):
+        new_post = getattr(destination_subreddit, method)(**kwargs)
+
+    # Set post flair from source
+    if new_post and source_flair_text:
+        matching_flair = flair_cache.template_id_for(source_flair_text)
+        if matching_flair:
+            with timed("flair"):
                 new_post.flair.select(matching_flair)
-                logging.info(f"Applied flair: {source_flair_text} to post {new_post.id}")
-            else:
-                logging.info(f"No matching flair found for: {source_flair_text}")
-
-        # Build comment with post information
-        if new_post:
-            comment_body = f"**Original post by u/{submission.author}:** [Here](https://www.reddit.com{submission.permalink})\n"
-            comment_body += f"\n**Original Post ID:** {submission.id}"
-            if original_media_url:
-                comment_body += f"\n\n**Direct link to media:** [Media Here]({original_media_url})"
-            if audio_url:
-                comment_body += f"\n\n**Direct link to Audio:** [Audio Here]({audio_url})"
-            if submission.selftext:
-                comment_body += f"\n\n**Original post text:** {submission.selftext}"
-                comment_body += "\n\n---\n\n"                
-            if hasattr(submission, 'link_flair_template_id'):
-                comment_body += f"\n\n**Original Flair ID:** {submission.link_flair_template_id}\n"
-            if submission.link_flair_text:
-                comment_body += f"\n**Original Flair Text:** {submission.link_flair_text}"
-            # Split comment if greater than 10,000 characters - Reddit limit
-            if len(comment_body) > 10000:
-                for chunk in split_text(comment_body):
+            logging.info(f"Applied flair: {source_flair_text} to post {new_post.id}")
+        else:
+            logging.info(f"No matching flair found for: {source_flair_text}")
+
+    # Build comment with post information
+    if new_post:
+        comment_body = build_comment(post, prepared)
+        # Split comment if greater than 10,000 characters - Reddit limit
+        if len(comment_body) > 10000:
+            for chunk in split_text(comment_body):
+                rate_limiter.wait()
+                with timed("reply"):
                     new_post.reply(chunk)
-                    time.sleep(5)
-            else:
+        else:
+            with timed("reply"):
                 new_post.reply(comment_body)
-
-        newly_copied_post_ids.append(submission.id)
-        print(f"Copied post {submission.id}: {submission.title}")
-        # Respect Reddit API Limit
-        time.sleep(10)
-    # Log exceptions
-    except (RequestException, ResponseException, RedditAPIException) as ex:
-        logging.error(f"Error for post {submission.id}: {str(ex)}")
-    except Exception as e:
-        logging.error(f"General error for post {submission.id}: {str(e)}")
-    # Cleanup downloaded media
-    for img in gallery_images:
-        if os.path.exists(img):
-            os.remove(img)
-    if media_url and os.path.exists(media_url):
-        os.remove(media_url)
-    if os.path.exists(audio_file):
-        os.remove(audio_file)
-    if os.path.exists(merged_file):
-        os.remove(merged_file)
-        
-# Append new post IDs and trim oldest lines
-if newly_copied_post_ids:
+    return new_post
+
+
+def archive_post(post, future):
+    """Submit stage for one post: wait for its media, post it, record it and clean up."""
+    with traced(post):
+        prepared = None
+        status = "failed"
+        try:
+            prepared = future.result()
+            if state_store.is_processed(post["id"]):
+                # Archived since it was listed (overlapping cron run, or listed twice)
+                print(f"Skipped post {post['id']}, already archived: {post['title']}")
+                status = "skipped"
+                new_post = None
+            elif prepared["duplicate_of"] and DUPLICATE_ACTION == "skip":
+                record_duplicate(state_store, post, prepared)
+                print(f"Skipped duplicate post {post['id']}: {post['title']}")
+                status = "duplicate"
+                new_post = None
+            else:
+                new_post = submit_post(post, prepared)
+            if new_post:
+                record_archive(state_store, duplicate_index, post, prepared, new_post)
+                print(f"Copied post {post['id']}: {post['title']}")
+                status = "archived"
+                # Respect Reddit API Limit
+                with timed("rate_wait"):
+                    rate_limiter.wait()
+        # Log exceptions
+        except (RequestException, ResponseException, RedditAPIException) as ex:
+            logging.error(f"Error for post {post['id']}: {str(ex)}")
+        except Exception as e:
+            logging.error(f"General error for post {post['id']}: {str(e)}")
+        # Cleanup downloaded media
+        if prepared:
+            cleanup_media(prepared)
+        finish_trace(post, status)
+
+
+def discard_prepared(future):
+    if not future.cancelled() and future.exception() is None:
+        cleanup_media(future.result())
+
+
+def drop_post(post, future):
+    """Stopping: let go of a queued post. It isn't recorded, so the next start lists it again."""
+    logging.info(f"Stopping, leaving post {post['id']} for the next run.")
+    if not future.cancel():
+        future.add_done_callback(discard_prepared)
+
+
+def run_pipeline(produce, on_done=None):
+    """
+    Listing thread -> download/merge pool -> submit (this thread, in listing order).
+    produce(prepare_pool, ready_queue) queues (post, future) pairs and finishes with None.
+    """
+    ready_queue = queue.Queue(maxsize=PREFETCH_POSTS)
+    with ThreadPoolExecutor(max_workers=PREPARE_WORKERS) as prepare_pool:
+        lister = threading.Thread(target=produce, args=(prepare_pool, ready_queue), daemon=True)
+        lister.start()
+        while True:
+            item = ready_queue.get()
+            if item is None:
+                break
+            post, future = item
+            if stop_event.is_set():
+                # Keep draining so the lister can finish, but don't start another submit
+                drop_post(post, future)
+                continue
+            archive_post(post, future)
+            if on_done:
+                on_done(post)
+        lister.join()
+
+
+# --- daemon mode ---
+
+stop_event = threading.Event()
+streamed_posts = collections.deque()  # (fullname, created_utc, id) queued but not checkpointed yet, oldest first
+streamed_ids = set()
+abandoned_ids = collections.OrderedDict()  # Failed every attempt, not picked up again when the stream replays them
+stream_lock = threading.Lock()
+failed_posts = queue.Queue()  # Posts the submitter couldn't archive, handed back to the stream thread
+
+
+def request_stop(signum, frame):
+    # Finish the post being submitted, drop the queued ones, then exit through the normal checkpoint.
+    # Only sets the event: printing here could interrupt a write to stdout and raise
+    stop_event.set()
+
+
+def forget_streamed(post_id):
+    with stream_lock:
+        for entry in streamed_posts:
+            if entry[2] == post_id:
+                streamed_posts.remove(entry)
+                break
+        streamed_ids.discard(post_id)
+
+
+def retry_failed_posts(retries, attempts, prepare_pool, ready_queue):
+    """Requeue failed posts once DAEMON_RETRY_DELAY has passed, give up after DAEMON_MAX_ATTEMPTS."""
+    while not failed_posts.empty():
+        post = failed_posts.get()
+        if attempts.get(post["id"], 1) >= DAEMON_MAX_ATTEMPTS:
+            logging.error(f"Giving up on post {post['id']} after {DAEMON_MAX_ATTEMPTS} attempts.")
+            attempts.pop(post["id"], None)
+            abandoned_ids[post["id"]] = True
+            while len(abandoned_ids) > ABANDONED_KEEP:
+                abandoned_ids.popitem(last=False)
+            forget_streamed(post["id"])
+        else:
+            retries.append((time.time() + DAEMON_RETRY_DELAY, post))
+    # A retry that went through needs no count any more
+    for post_id in [post_id for post_id in attempts if state_store.is_processed(post_id)]:
+        del attempts[post_id]
+    now = time.time()
+    for due, post in [retry for retry in retries if retry[0] <= now]:
+        retries.remove((due, post))
+        attempts[post["id"]] = attempts.get(post["id"], 1) + 1
+        queue_post(post, prepare_pool, ready_queue)
+
+
+def stream_new_posts(prepare_pool, ready_queue):
+    """
+    Daemon listing stage. Follows /new through PRAW's submission stream until stop_event is set.
+    The stream replays recent posts when (re)opened; processed or already queued ones are skipped.
+    Polls every POLL_INTERVAL; in between it requeues failed posts and clears stale work files.
+    """
+    retries = []  # (due time, post)
+    attempts = {}  # post id -> attempts so far
+    last_maintenance = time.time()
+    last_metrics_flush = time.time()
     try:
-        # Read existing IDs (if any)
-        existing_ids = []
-        if os.path.exists(PROCESSED_FILE):
-            with open(PROCESSED_FILE, "r") as f:
-                existing_ids = f.read().splitlines()
-
-        # Merge and deduplicate, preserving order (oldest first)
-        all_ids = existing_ids + newly_copied_post_ids
-        seen = set()
-        unique_ids = [x for x in all_ids if not (x in seen or seen.add(x))]
-
-        # Trim aggressively — keep only newest MAX_PROCESSED_IDS
-        if len(unique_ids) > MAX_PROCESSED_IDS:
-            unique_ids = unique_ids[-MAX_PROCESSED_IDS:]
-            print(f"Trimmed processed_posts.txt to {len(unique_ids)} entries.")
-
-        # Write atomically using a temporary file
-        temp_path = PROCESSED_FILE + ".tmp"
-        with open(temp_path, "w") as f:
-            f.write("\n".join(unique_ids) + "\n")
-        os.replace(temp_path, PROCESSED_FILE)  # atomic move
+        while not stop_event.is_set():
+            try:
+                # Negative pause_after: None after every poll, PRAW doesn't sleep between them itself
+                for submission in source_subreddit.stream.submissions(pause_after=-1):
+                    if stop_event.is_set():
+                        break
+                    if submission is None:
+                        retry_failed_posts(retries, attempts, prepare_pool, ready_queue)
+                        if time.time() - last_maintenance > MAINTENANCE_INTERVAL:
+                            cleanup_stale_jobs(MEDIA_DOWNLOAD_DIR)
+                            cleanup_stale_partials(PARTIAL_DOWNLOAD_DIR)
+                            last_maintenance = time.time()
+                        if time.time() - last_metrics_flush > METRICS_FLUSH_INTERVAL:
+                            metrics.flush(METRICS_FILE, state_store)
+                            last_metrics_flush = time.time()
+                        stop_event.wait(POLL_INTERVAL)
+                        continue
+
+                    if submission.id in abandoned_ids and state_store.is_processed(submission.id):
+                        del abandoned_ids[submission.id]  # Archived by hand since (CopySinglePost.py)
+                    post_time = datetime.fromtimestamp(submission.created_utc, timezone.utc)
+                    if post_time < cutoff_time or submission.id in streamed_ids or submission.id in abandoned_ids:
+                        continue
+                    if state_store.is_processed(submission.id):
+                        continue
+                    logging.info(f"Processing submission: {submission.title}, Flair: {submission.link_flair_text}, Created: {submission.created_utc}")
+                    with stream_lock:
+                        streamed_posts.append((submission.fullname, submission.created_utc, submission.id))
+                        streamed_ids.add(submission.id)
+                    queue_post(snapshot_submission(submission), prepare_pool, ready_queue)
+            except Exception as e:
+                logging.error(f"Submission stream failed, reopening in {STREAM_RESTART_DELAY}s: {str(e)}")
+                stop_event.wait(STREAM_RESTART_DELAY)
+    finally:
+        ready_queue.put(None)
+
+
+def checkpoint_stream(post):
+    """
+    After each post: hand failures back for a retry and move the cursor past everything archived.
+    The stream doesn't read the cursor, it's kept so a cron or --async run after the daemon only
+    lists what the daemon hasn't archived.
+    """
+    if not state_store.is_processed(post["id"]):
+        failed_posts.put(post)
+    cursor = None
+    with stream_lock:
+        while streamed_posts and state_store.is_processed(streamed_posts[0][2]):
+            fullname, created_utc, post_id = streamed_posts.popleft()
+            streamed_ids.discard(post_id)
+            cursor = (fullname, created_utc)
+    if cursor:
+        save_listing_cursor(cursor)
+
+
+# Command line: optional time delta, --async for the asyncpraw pipeline
+parser = argparse.ArgumentParser(description="Copy new r/ufos posts to r/UFOs_Archive.")
+parser.add_argument("time_delta", nargs="?", help="how far back to look, e.g. 40m or 2h (default 40m)")
+parser.add_argument("--async", dest="use_async", action="store_true",
+                    help="run the asyncpraw pipeline instead (needs asyncpraw installed)")
+parser.add_argument("--daemon", action="store_true",
+                    help="keep running and follow new posts as they arrive; the time delta is the catch-up window at start")
+parser.add_argument("--metrics-port", type=int, default=settings.get("metrics_port"),
+                    help="daemon mode: also serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+args = parser.parse_args()
+if args.daemon and args.use_async:
+    parser.error("--daemon runs the sync pipeline, drop --async")
+time_delta = parse_time_delta(args.time_delta)
 
-    except Exception as e:
-        logging.error(f"Failed to update processed_posts.txt safely: {str(e)}")
+# Time filtering
+current_time = datetime.now(timezone.utc)
+cutoff_time = current_time - time_delta
+
+state_store = StateStore(STATE_DB)
+state_store.import_processed_file(PROCESSED_FILE)
+flair_cache = FlairTemplateCache(destination_subreddit, FLAIR_CACHE_FILE)
+media_cache = MediaCache(MEDIA_CACHE_DIR)
+duplicate_index = DuplicateIndex(state_store)
+preparer = MediaPreparer(media_cache, duplicate_index, MEDIA_DOWNLOAD_DIR, PARTIAL_DOWNLOAD_DIR)
+metrics.start_run("copy_posts", state_store)
+cleanup_stale_jobs(MEDIA_DOWNLOAD_DIR)
+cleanup_stale_partials(PARTIAL_DOWNLOAD_DIR)
+
+# Start of script - Fetch new posts
+print(f"Starting script. Scan interval: {time_delta}.")
+listed_posts = [] # (fullname, created_utc, id) inside the window, newest first
+
+if args.use_async:
+    # Imported here so the sync path doesn't need asyncpraw installed
+    from async_copier import AsyncCopier
+    copier = AsyncCopier(
+        state_store, preparer, duplicate_index, FLAIR_CACHE_FILE,
+        listing_floor=listing_floor(load_listing_cursor(), cutoff_time),
+        prefetch_posts=PREFETCH_POSTS
+    )
+    asyncio.run(copier.run(cutoff_time, listed_posts))
+elif args.daemon:
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    print("Running as a daemon, following new submissions.")
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+    run_pipeline(stream_new_posts, on_done=checkpoint_stream)
+    logging.info("Daemon stopped, queued posts left for the next start.")
+    print("Daemon stopped.")
+else:
+    run_pipeline(list_new_posts)
+
+# Remember where this run got to so the next one only lists newer posts (the daemon checkpoints as it goes)
+try:
+    old_cursor = load_listing_cursor()
+    new_cursor = advance_listing_cursor(old_cursor)
+    if new_cursor and new_cursor != old_cursor:
+        save_listing_cursor(new_cursor)
+except Exception as e:
+    logging.error(f"Failed to update listing cursor: {str(e)}")
+
+metrics.flush(METRICS_FILE, state_store)
@@ -1,7 +1,15 @@
 import praw
-import requests
+import dash_manifest  # DASHPlaylist.mpd parser
+from rate_limiter import RedditRateLimiter
+from state_store import StateStore
+from flair_cache import FlairTemplateCache
+from media_jobs import MediaJob, merge_audio_video
+from media_cache import MediaCache, merge_key
+from duplicate_index import DUPLICATE_ACTION, image_hashes, video_hashes
+from media_download import download_file
+from media_prepare import is_image, video_hash_source
+from structured_log import setup_logging
 import os
-import time
 import logging
 import sys
 import re
@@ -11,14 +19,15 @@ from praw.exceptions import RedditAPIException
 import config
 import subprocess
 import shutil
+from settings import ARCHIVE_DIR  # Folder for state, logs, caches and temp media
 
 # ------------------------------------------------------------
 # Logging
 # ------------------------------------------------------------
-logging.basicConfig(
-    filename='/home/ubuntu/Reddit-UFOs_Archive/error_log.txt',
-    level=logging.ERROR,
-    format='%(asctime)s %(levelname)s: %(message)s'
+# Readable errors plus JSON lines, levels from ARCHIVE_LOG_LEVEL / config.py
+setup_logging(
+    os.path.join(ARCHIVE_DIR, "error_log.txt"),
+    json_log=os.path.join(ARCHIVE_DIR, "pipeline_log.jsonl")
 )
 
 # ------------------------------------------------------------
@@ -37,18 +46,25 @@ archives_reddit = praw.Reddit(
     client_secret=config.destination_client_secret,
     password=config.destination_password,
     username=config.destination_username,
-    user_agent=config.destination_user_agent
+    user_agent=config.destination_user_agent,
+    ratelimit_seconds=300  # Let PRAW wait out "doing that too much" on submissions instead of failing
 )
 
 source_subreddit = source_reddit.subreddit('ufos')
 destination_subreddit = archives_reddit.subreddit('UFOs_Archive')
+rate_limiter = RedditRateLimiter(source_reddit, archives_reddit)
 
 # ------------------------------------------------------------
 # Paths / Constants
 # ------------------------------------------------------------
-MEDIA_DOWNLOAD_DIR = "/home/ubuntu/Reddit-UFOs_Archive/temp_media"
-PROCESSED_FILE = "/home/ubuntu/Reddit-UFOs_Archive/processed_posts.txt"
-MAX_PROCESSED_IDS = 2000
+MEDIA_DOWNLOAD_DIR = os.path.join(ARCHIVE_DIR, "temp_media")
+STATE_DB = os.path.join(ARCHIVE_DIR, "archive_state.db")
+PROCESSED_FILE = os.path.join(ARCHIVE_DIR, "processed_posts.txt")
+FLAIR_CACHE_FILE = os.path.join(ARCHIVE_DIR, "flair_templates.json")
+PARTIAL_DOWNLOAD_DIR = os.path.join(MEDIA_DOWNLOAD_DIR, ".partial")
+
+# Content-addressed cache of finished downloads and merges, shared across runs and reposts
+MEDIA_CACHE_DIR = os.path.join(ARCHIVE_DIR, "media_cache")
 
 os.makedirs(MEDIA_DOWNLOAD_DIR, exist_ok=True)
 
@@ -61,23 +77,29 @@ def get_post_id():
         sys.exit(1)
     return sys.argv[1]
 
-def download_media(url, file_name):
+def download_media(url, file_name, dest_dir=MEDIA_DOWNLOAD_DIR):
     if "preview.redd.it" in url:
         url = url.replace("preview.redd.it", "i.redd.it")
 
     headers = {'User-Agent': 'Mozilla/5.0'}
-    full_path = os.path.join(MEDIA_DOWNLOAD_DIR, file_name)
+    full_path = os.path.join(dest_dir, file_name)
 
-    resp = requests.get(url, stream=True, headers=headers)
-    if resp.status_code == 200:
-        with open(full_path, 'wb') as f:
-            for chunk in resp.iter_content(1024):
-                f.write(chunk)
+    # Earlier failed attempts at this post usually left the media in the cache
+    if media_cache.fetch(url, full_path):
+        return full_path
+    if download_file(url, full_path, headers=headers, partial_dir=PARTIAL_DOWNLOAD_DIR):
+        media_cache.store(url, full_path)
         return full_path
-
-    logging.error(f"Failed to download media: {url}")
     return None
 
+def merge_media(video_url, audio_url, output_path):
+    key = merge_key(video_url, audio_url)
+    if media_cache.fetch(key, output_path):
+        return output_path
+    merge_audio_video(video_url, audio_url, output_path)
+    media_cache.store(key, output_path)
+    return output_path
+
 def split_text(text, max_length=10000):
     chunks = []
     while len(text) > max_length:
@@ -90,51 +112,34 @@ def split_text(text, max_length=10000):
     return chunks
 
 def get_audio_url_from_fallback(video_url):
+    # Only used when the DASH manifest can't be read
     if not video_url:
         return None
     return video_url.rsplit('/', 1)[0] + "/CMAF_AUDIO_64.mp4"
 
-def update_processed_posts(post_id):
-    try:
-        existing_ids = []
-        if os.path.exists(PROCESSED_FILE):
-            with open(PROCESSED_FILE, "r") as f:
-                existing_ids = f.read().splitlines()
-
-        all_ids = existing_ids + [post_id]
-
-        seen = set()
-        unique_ids = [x for x in all_ids if not (x in seen or seen.add(x))]
-
-        if len(unique_ids) > MAX_PROCESSED_IDS:
-            unique_ids = unique_ids[-MAX_PROCESSED_IDS:]
-
-        temp_path = PROCESSED_FILE + ".tmp"
-        with open(temp_path, "w") as f:
-            f.write("\n".join(unique_ids) + "\n")
-
-        os.replace(temp_path, PROCESSED_FILE)
-        logging.info(f"Added {post_id} to processed_posts.txt")
-
-    except Exception as e:
-        logging.error(f"Failed to update processed_posts.txt: {e}")
-
 # ------------------------------------------------------------
 # Main
 # ------------------------------------------------------------
 post_id = get_post_id()
+state_store = StateStore(STATE_DB)
+state_store.import_processed_file(PROCESSED_FILE)
+media_cache = MediaCache(MEDIA_CACHE_DIR)
+flair_cache = FlairTemplateCache(destination_subreddit, FLAIR_CACHE_FILE)
 submission = source_reddit.submission(id=post_id)
 
 video_url = None
 audio_url = None
 dash_url = None
+dash_audio_url = None
+manifest = dash_manifest.EMPTY_MANIFEST
+manifest_read = False
 media_url = None
 original_media_url = None
 gallery_images = []
 
-video_file = os.path.join(MEDIA_DOWNLOAD_DIR, 'media_video.mp4')
-audio_file = os.path.join(MEDIA_DOWNLOAD_DIR, 'media_audio.mp4')
-merged_file = os.path.join(MEDIA_DOWNLOAD_DIR, 'merged_video.mp4')
+# Private work directory so this never collides with a running copier
+job = MediaJob(MEDIA_DOWNLOAD_DIR, post_id)
+merged_file = job.path('merged_video.mp4')
 
 try:
     logging.info(f"Processing single submission {submission.id}")
@@ -164,18 +169,14 @@ try:
             elif meta.get('e') == 'RedditVideo':
                 dash_url = meta.get('dashUrl')
                 if dash_url:
-                    for res in ("1080", "720", "480"):
-                        test = dash_url.replace("DASHPlaylist.mpd", f"DASH_{res}.mp4")
-                        if requests.head(test).status_code == 200:
-                            img_url = test
-                            break
+                    img_url, _ = dash_manifest.best_stream_urls(dash_url)
 
                 if not img_url and submission.media and 'reddit_video' in submission.media:
                     img_url = submission.media['reddit_video'].get('fallback_url')
 
             if img_url:
                 ext = os.path.splitext(img_url.split("?")[0])[-1]
-                downloaded = download_media(img_url, f"{media_id}{ext}")
+                downloaded = download_media(img_url, f"{media_id}{ext}", job.dir)
                 if downloaded:
                     gallery_images.append(downloaded)
 
@@ -186,11 +187,12 @@ try:
         for meta in submission.media_metadata.values():
             if meta.get('e') == 'RedditVideo' and 'dashUrl' in meta:
                 dash_url = meta['dashUrl']
-                for res in ("1080", "720", "480"):
-                    test = dash_url.replace("DASHPlaylist.mpd", f"DASH_{res}.mp4")
-                    if requests.head(test).status_code == 200:
-                        video_url = test
-                        break
+                # Kept for the duplicate index, which hashes the smallest rendition like the copier
+                manifest = dash_manifest.fetch_manifest(dash_url)
+                best_video, best_audio = dash_manifest.pick_best(manifest.representations)
+                video_url = best_video.url if best_video else None
+                dash_audio_url = best_audio.url if best_audio else None
+                manifest_read = video_url is not None
 
                 if not video_url and submission.media:
                     video_url = submission.media['reddit_video'].get('fallback_url')
@@ -210,12 +212,20 @@ try:
         is_gif = rv.get('is_gif', False)
         original_media_url = video_url
         dash_url = rv.get('dash_url') or rv.get('dashUrl')
+        if dash_url:
+            manifest = dash_manifest.fetch_manifest(dash_url)
+            best_video, best_audio = dash_manifest.pick_best(manifest.representations)
+            dash_audio_url = best_audio.url if best_audio else None
+            if best_video:
+                manifest_read = True
+                video_url = best_video.url
+                original_media_url = video_url
 
     # --------------------------------------------------------
     # Direct image
     # --------------------------------------------------------
     elif submission.url.endswith(('jpg', 'jpeg', 'png', 'gif')):
-        media_url = download_media(submission.url, os.path.basename(submission.url))
+        media_url = download_media(submission.url, os.path.basename(submission.url), job.dir)
         original_media_url = submission.url
 
     # --------------------------------------------------------
@@ -223,20 +233,19 @@ try:
     # --------------------------------------------------------
     if video_url:
         if has_audio and not is_gif:
-            audio_url = get_audio_url_from_fallback(video_url)
+            if manifest_read:
+                audio_url = dash_audio_url
+            else:
+                audio_url = get_audio_url_from_fallback(video_url)
             if audio_url:
                 try:
-                    subprocess.run(
-                        ["ffmpeg", "-y", "-loglevel", "error",
-                         "-i", video_url, "-i", audio_url,
-                         "-c", "copy", merged_file],
-                        check=True
-                    )
-                    media_url = merged_file
+                    media_url = merge_media(video_url, audio_url, merged_file)
                 except subprocess.CalledProcessError:
-                    media_url = download_media(video_url, "media_video.mp4")
+                    media_url = download_media(video_url, "media_video.mp4", job.dir)
+            else:
+                media_url = download_media(video_url, "media_video.mp4", job.dir)
         else:
-            media_url = download_media(video_url, "media_video.mp4")
+            media_url = download_media(video_url, "media_video.mp4", job.dir)
 
     # --------------------------------------------------------
     # Submit
@@ -262,10 +271,9 @@ try:
     # Flair
     # --------------------------------------------------------
     if submission.link_flair_text:
-        for flair in destination_subreddit.flair.link_templates:
-            if flair['text'] == submission.link_flair_text:
-                new_post.flair.select(flair['id'])
-                break
+        matching_flair = flair_cache.template_id_for(submission.link_flair_text)
+        if matching_flair:
+            new_post.flair.select(matching_flair)
 
     # --------------------------------------------------------
     # Comment
@@ -284,13 +292,33 @@ try:
         body += f"\n\n**Original post text:** {submission.selftext}\n\n---"
 
     for chunk in split_text(body):
+        rate_limiter.wait()
         new_post.reply(chunk)
-        time.sleep(5)
 
     # --------------------------------------------------------
     # Record processed post
     # --------------------------------------------------------
-    update_processed_posts(submission.id)
+    state_store.record_archived(
+        submission.id,
+        archive_id=new_post.id,
+        media_urls=[original_media_url, audio_url],
+        flair_text=submission.link_flair_text,
+        flair_id=getattr(submission, 'link_flair_template_id', None),
+        source_created_utc=submission.created_utc
+    )
+    logging.info(f"Recorded {submission.id} -> {new_post.id} in the state store")
+
+    # Index the uploaded media so the copier recognises later reposts of it. Same sources and
+    # filter as the copier's check_duplicate, or the two would hash one post differently
+    if DUPLICATE_ACTION != "off":
+        if gallery_images:
+            hashes = [value for path in gallery_images if is_image(path) for value in image_hashes(path)]
+            state_store.add_media_hashes(submission.id, "image", hashes)
+        elif video_url and not is_self_post:
+            hash_source = video_hash_source(manifest if manifest_read else None, video_url)
+            state_store.add_media_hashes(submission.id, "video", video_hashes(hash_source))
+        elif media_url and os.path.exists(media_url) and is_image(media_url):
+            state_store.add_media_hashes(submission.id, "image", image_hashes(media_url))
 
     print(f"Copied single post {submission.id}: {submission.title}")
 
@@ -300,9 +328,4 @@ except Exception as e:
     logging.error(f"General error for post {submission.id}: {e}")
 
 finally:
-    for f in gallery_images:
-        if os.path.exists(f):
-            os.remove(f)
-    for f in (media_url, merged_file, audio_file):
-        if f and os.path.exists(f):
-            os.remove(f)
+    job.cleanup()
@@ -1,19 +1,24 @@
 import praw
-import time
+import os
 import logging
 from datetime import datetime, timedelta, timezone
-from prawcore.exceptions import RequestException, ResponseException, NotFound
+from prawcore import Requestor
+from prawcore.exceptions import RequestException, ResponseException
 from praw.exceptions import RedditAPIException
 import config  # Import the config file with credentials
 import re
+import time
 import tenacity
+from rate_limiter import RedditRateLimiter
+from state_store import StateStore, STATUS_REMOVED
+from removal_rules import load_rules, compile_predicate, removed_ids
+from structured_log import setup_logging, timed
+import metrics  # Prometheus textfile metrics
+import settings  # Optional config.py values
+from settings import ARCHIVE_DIR  # Folder for state, logs, caches and temp media
 
-# Set up logging
-logging.basicConfig(
-    filename='/home/ubuntu/Reddit-UFOs_Archive/error_log.txt',
-    level=logging.ERROR,
-    format='%(asctime)s %(levelname)s: %(message)s'
-)
+# Set up logging: readable errors plus JSON lines with stage timings (levels: ARCHIVE_LOG_LEVEL / config.py)
+setup_logging(os.path.join(ARCHIVE_DIR, "error_log.txt"), json_log=os.path.join(ARCHIVE_DIR, "removed_flair_log.jsonl"))
 
 # Reddit API credentials for /r/ufos (source, moderator account)
 source_reddit = praw.Reddit(
@@ -21,7 +26,8 @@ source_reddit = praw.Reddit(
     client_secret=config.source_client_secret,
     password=config.source_password,
     username=config.source_username,
-    user_agent=config.source_user_agent
+    user_agent=config.source_user_agent,
+    requestor_class=metrics.counting_requestor(Requestor, "source")
 )
 
 # Reddit API credentials for /r/UFOs_Archive (destination, bot account)
@@ -30,67 +36,47 @@ destination_reddit = praw.Reddit(
     client_secret=config.destination_client_secret,
     password=config.destination_password,
     username=config.destination_username,
-    user_agent=config.destination_user_agent
+    user_agent=config.destination_user_agent,
+    requestor_class=metrics.counting_requestor(Requestor, "archive")
 )
 
 # Subreddits
 source_subreddit = source_reddit.subreddit('ufos')
 destination_subreddit = destination_reddit.subreddit('UFOs_Archive')
 
-# Get current time and calculate cutoff for the last 16 hours
+# Shared state database written by the copier
+STATE_DB = os.path.join(ARCHIVE_DIR, "archive_state.db")
+state_store = StateStore(STATE_DB)
+
+# node-exporter textfile, next to the copier's copy_posts.prom
+METRICS_FILE = os.path.join(settings.get("metrics_textfile_dir", os.path.join(ARCHIVE_DIR, "metrics")), "removed_flair.prom")
+metrics.start_run("removed_flair", state_store)
+
+# Recheck schedule: a post is checked again after half its current age, clamped to these bounds,
+# so young posts are checked every few minutes and older ones back off exponentially
+MIN_RECHECK_INTERVAL = 10 * 60
+MAX_RECHECK_INTERVAL = 12 * 60 * 60
+# Posts older than this are no longer checked
+MAX_RECHECK_AGE = 72 * 60 * 60
+
+# How often /r/UFOs_Archive is listed to pick up archive posts the state store doesn't know yet
+BACKFILL_SCAN_INTERVAL = 8 * 60 * 60
+
+# Get current time and calculate cutoff for the backfill scan
 current_time = datetime.now(timezone.utc)
 cutoff_time = current_time - timedelta(hours=16)
 
-# List of removal flair texts in /r/ufos (for redundancy)
-removal_flairs = [
-    "Rule 1: Follow the Standards of Civility",
-    "Rule 2: Posts must be on-topic",
-    "Rule 3: Be substantive",
-    "Rule 14: Off-topic political discussion",
-    "Rule 4: No duplicate posts",
-    "Rule 5: No commercial activity",
-    "Rule 6: Bad title",
-    "Rule 7: Posting limits",
-    "Rule 8: No memes",
-    "Rule 9: Link posts must include a submission statement",
-    "Rule 11: Common Questions",
-    "Posting Guidelines for Sightings",
-    "Better suited for the current megathread",
-    "Rule 12: Meta-posts must be posted in r/ufosmeta",
-    "Rule 13: Low effort comments regarding public figures"
-]
-
-# List of removal flair IDs in /r/ufos
-removal_flair_ids = [
-    "7b14f2ce-cfbf-11eb-89f4-0e476f3d9d3d",  # Rule 1: Follow the Standards of Civility
-    "80d51022-cfbf-11eb-abbc-0ef931b77cdb",  # Rule 2: Posts must be on-topic
-    "85ced3d8-cfbf-11eb-9eab-0e63e592d261",  # Rule 3: Be substantive
-    "8b9f15e8-cfbf-11eb-abeb-0ef152a43b0f",  # Rule 4: No duplicate posts
-    "909be63e-cfbf-11eb-bbac-0ede7dbb605d",  # Rule 5: No commercial activity
-    "95d860aa-cfbf-11eb-a918-0e7f2c8d7c01",  # Rule 6: Bad title
-    "cf3b5fa8-df66-11eb-bce8-0e4db6ae439b",  # Rule 7: Posting limits
-    "fd60122a-df66-11eb-93ed-0e956b4f6669",  # Rule 8: No memes
-    "643158c8-b0c3-11ec-8fad-0a0cedfa08f2",  # Rule 9: Link posts must include a submission statement
-    "597ab2f2-200e-11ed-81e1-ca42d471553b",  # Rule 11: Common Questions
-    "9af1649c-cfbf-11eb-b874-0ea1a57cb45d",  # Posting Guidelines for Sightings
-    "434058ea-df67-11eb-af98-0eaea14e6779",  # Better suited for the current megathread
-    "13d3b30c-94ad-11ed-b87c-bad73d311b50",  # Rule 12: Meta-posts must be posted in r/ufosmeta
-    "ce8f9fd6-ff69-11ed-862a-4adf08bd01f6",  # Rule 13: Low effort comments regarding public figures
-    "dd02bab2-ff69-11ed-9d19-2648400e7657"   # Rule 14: Off-topic political discussion
-]
+# Removal flairs and markers for /r/ufos, loaded once from removal_rules.json
+is_post_removed = compile_predicate(load_rules())
 
 # Flair ID for "Removed" in /r/UFOs_Archive
 removed_flair_id = "2aae3c82-e59b-11ef-82e4-264414cc8e5f"
 
-REQUEST_DELAY = 1.0  # Adjust if rate limits are hit
-last_request_time = 0
+# Max fullnames Reddit's /api/info accepts per request
+INFO_BATCH_SIZE = 100
 
-def wait_if_needed():
-    global last_request_time
-    elapsed = time.time() - last_request_time
-    if elapsed < REQUEST_DELAY:
-        time.sleep(REQUEST_DELAY - elapsed)
-    last_request_time = time.time()
+# Shared API budget for both accounts, driven by Reddit's rate limit headers
+rate_limiter = RedditRateLimiter(source_reddit, destination_reddit)
 
 # Retry decorator for API calls
 @tenacity.retry(
@@ -99,76 +85,156 @@ def wait_if_needed():
     retry=tenacity.retry_if_exception_type((RequestException, ResponseException, RedditAPIException)),
     before_sleep=lambda retry_state: logging.warning(f"Retrying API call: attempt {retry_state.attempt_number}")
 )
-def fetch_submission(reddit, submission_id):
-    return reddit.submission(id=submission_id)
-
-print("Starting script: Checking posts from the last 16 hours.")
-
-# Check posts in /r/UFOs_Archive
-for archived_submission in destination_subreddit.new(limit=200):
-    try:
-        post_time = datetime.fromtimestamp(archived_submission.created_utc, timezone.utc)
-        if post_time < cutoff_time:
-            logging.debug(f"Skipping older post: {archived_submission.id}")
-            break  # Stop processing older posts
-
-        logging.debug(f"Checking archived post: {archived_submission.id} - {archived_submission.title}")
-
-        # Ensure all comments are loaded
-        archived_submission.comments.replace_more(limit=0)
-        original_post_id = None
-
-        # Search for original post ID in comments
-        for comment in archived_submission.comments:
-            if comment.author and comment.author.name == config.destination_username:  # Ensure comment is from bot
-                match = re.search(r'\*\*Original Post ID:\*\* ([a-z0-9]+)', comment.body)
-                if match:
-                    original_post_id = match.group(1)
-                    logging.debug(f"Extracted original post ID: {original_post_id}")
-                    break
-
-        if not original_post_id:
-            logging.warning(f"No original post ID found for archived post: {archived_submission.id}")
-            continue
-
+def fetch_submissions_info(reddit, submission_ids):
+    # One /api/info call for up to INFO_BATCH_SIZE posts; missing (deleted) posts are simply absent
+    return list(reddit.info(fullnames=[f"t3_{submission_id}" for submission_id in submission_ids]))
+
+def check_removed(post_ids):
+    """
+    Resolve every original post in batches of INFO_BATCH_SIZE using /api/info.
+    Returns {post_id: is_removed}; posts Reddit no longer returns count as removed.
+    Batches that fail after retries are left out so they're checked again next run.
+    """
+    results = {}
+    for start in range(0, len(post_ids), INFO_BATCH_SIZE):
+        batch = post_ids[start:start + INFO_BATCH_SIZE]
         try:
-            # Fetch the original post in /r/ufos using moderator credentials
-            original_submission = fetch_submission(source_reddit, original_post_id)
-            wait_if_needed()
-
-            # Check if post is removed, deleted, or has a removal flair
-            is_removed = (
-                original_submission.removed_by_category is not None or
-                original_submission.selftext == "[deleted]" or
-                original_submission.selftext == "[removed]" or
-                (original_submission.link_flair_text and original_submission.link_flair_text in removal_flairs) or
-                (getattr(original_submission, "link_flair_template_id", None) in removal_flair_ids) or
-                not original_submission.author  # Author deleted or banned
-            )
-            
-            if is_removed:
-                archived_submission.mod.flair(flair_template_id=removed_flair_id)
-                logging.info(f"Updated flair to 'Removed' for archived post: {archived_submission.id}")
-                print(f"Updated flair to 'Removed' for archived post: {archived_submission.title}")
-            else:
-                logging.debug(f"Original post still exists: {original_post_id}")
-
-        except NotFound:
-            archived_submission.mod.flair(flair_template_id=removed_flair_id)
-            logging.info(f"Original post not found, marked as removed: {archived_submission.id}")
-            print(f"Original post not found, marked as removed: {archived_submission.title}")
+            rate_limiter.wait()
+            with timed("info_lookup", count=len(batch)):
+                found = {submission.id: submission for submission in fetch_submissions_info(source_reddit, batch)}
         except Exception as e:
-            logging.error(f"Error fetching original post {original_post_id}: {str(e)}")
+            logging.error(f"Error fetching original posts {batch[0]}..{batch[-1]}: {str(e)}")
             continue
-
-        wait_if_needed()
+        removed = removed_ids(is_post_removed, found.values())
+        for post_id in batch:
+            if post_id not in found:
+                logging.info(f"Original post not found: {post_id}")
+            results[post_id] = post_id not in found or post_id in removed
+    return results
+
+def next_check_time(created_utc, now):
+    """When to look at a post again, based on how old it is now."""
+    age = max(now - created_utc, 0)
+    if age >= MAX_RECHECK_AGE:
+        return None
+    return now + min(max(age / 2, MIN_RECHECK_INTERVAL), MAX_RECHECK_INTERVAL)
+
+def find_original_post_id(archived_submission):
+    """Scrape the bot's info comment for the source post ID (fallback for posts missing from the state store)."""
+    # Ensure all comments are loaded
+    archived_submission.comments.replace_more(limit=0)
+
+    # Search for original post ID in comments
+    for comment in archived_submission.comments:
+        if comment.author and comment.author.name == config.destination_username:  # Ensure comment is from bot
+            match = re.search(r'\*\*Original Post ID:\*\* ([a-z0-9]+)', comment.body)
+            if match:
+                logging.debug(f"Extracted original post ID: {match.group(1)}")
+                return match.group(1)
+    return None
+
+def source_created_times(post_ids):
+    """created_utc of the original posts, in batches of INFO_BATCH_SIZE. Posts that are gone or whose batch failed are left out."""
+    created = {}
+    for start in range(0, len(post_ids), INFO_BATCH_SIZE):
+        batch = post_ids[start:start + INFO_BATCH_SIZE]
+        try:
+            rate_limiter.wait()
+            with timed("info_lookup", count=len(batch)):
+                created.update((submission.id, submission.created_utc) for submission in fetch_submissions_info(source_reddit, batch))
+        except Exception as e:
+            logging.error(f"Error fetching original posts {batch[0]}..{batch[-1]}: {str(e)}")
+    return created
+
+def backfill_archive_index():
+    """
+    List recent /r/UFOs_Archive posts so archives the state store doesn't know about (made before
+    it existed, or by hand) get scheduled too. Archive posts already flaired Removed are marked
+    removed so they're never flaired again.
+    """
+    backfilled = []
+    for archived_submission in destination_subreddit.new(limit=200):
+        try:
+            post_time = datetime.fromtimestamp(archived_submission.created_utc, timezone.utc)
+            if post_time < cutoff_time:
+                logging.debug(f"Skipping older post: {archived_submission.id}")
+                break  # Stop processing older posts
+
+            # Source -> archive mapping recorded by the copier, no comment fetch needed
+            original_post_id = state_store.get_source_id(archived_submission.id)
+            if not original_post_id:
+                # Older posts: fall back to the bot comment and backfill the index
+                original_post_id = find_original_post_id(archived_submission)
+                if original_post_id:
+                    state_store.link_archive(original_post_id, archived_submission.id)
+                    backfilled.append((original_post_id, archived_submission.id, archived_submission.created_utc))
+
+            if not original_post_id:
+                logging.warning(f"No original post ID found for archived post: {archived_submission.id}")
+                continue
+
+            if getattr(archived_submission, "link_flair_template_id", None) == removed_flair_id:
+                state_store.set_status(original_post_id, STATUS_REMOVED)
+
+        except (RequestException, ResponseException, RedditAPIException) as ex:
+            logging.error(f"Reddit API error for archived post {archived_submission.id}: {str(ex)}")
+            print(f"Reddit API error for archived post {archived_submission.id}: {str(ex)}")
+        except Exception as e:
+            logging.error(f"General error for archived post {archived_submission.id}: {str(e)}")
+            print(f"General error for archived post {archived_submission.id}: {str(e)}")
+
+    # Recheck scheduling ages posts from when the original was made, as for rows the copier records.
+    # Originals that are gone fall back to the archive post's time, made within minutes of them
+    created = source_created_times([original_post_id for original_post_id, _, _ in backfilled])
+    for original_post_id, archive_id, archive_created_utc in backfilled:
+        state_store.link_archive(original_post_id, archive_id, source_created_utc=created.get(original_post_id, archive_created_utc))
+
+print("Starting script: Checking archived posts that are due for a removal check.")
+
+now = time.time()
+if now - float(state_store.get_meta("last_backfill_scan", 0)) > BACKFILL_SCAN_INTERVAL:
+    with timed("backfill"):
+        backfill_archive_index()
+    state_store.set_meta("last_backfill_scan", str(now))
+
+# Only posts whose next check is due; removed posts are never scheduled again
+due_posts = state_store.due_for_check(now, MAX_RECHECK_AGE)
+print(f"{len(due_posts)} archived posts due for a check.")
+
+# Fetch the original posts in /r/ufos using moderator credentials, 100 per request
+removed_status = check_removed([post["source_id"] for post in due_posts]) if due_posts else {}
+
+for post in due_posts:
+    original_post_id = post["source_id"]
+    archive_id = post["archive_id"]
+    if original_post_id not in removed_status:
+        metrics.REMOVAL_CHECKS.inc(result="lookup_failed")
+        continue  # Lookup failed, still due next run
+    try:
+        if removed_status[original_post_id]:
+            rate_limiter.wait()
+            # Built with its subreddit already set: mod.flair reads submission.subreddit, which on a
+            # plain reddit.submission(id=...) would fetch the whole archive post first
+            archived_submission = praw.models.Submission(destination_reddit, _data={"id": archive_id, "subreddit": destination_subreddit.display_name})
+            with timed("flair"):
+                archived_submission.mod.flair(flair_template_id=removed_flair_id)
+            state_store.set_status(original_post_id, STATUS_REMOVED)
+            state_store.record_check(original_post_id, None)
+            metrics.REMOVAL_CHECKS.inc(result="removed")
+            logging.info(f"Updated flair to 'Removed' for archived post: {archive_id}")
+            print(f"Updated flair to 'Removed' for archived post: {archive_id} (original {original_post_id})")
+        else:
+            state_store.record_check(original_post_id, next_check_time(post["created_utc"], time.time()))
+            metrics.REMOVAL_CHECKS.inc(result="present")
+            logging.debug(f"Original post still exists: {original_post_id}")
 
     except (RequestException, ResponseException, RedditAPIException) as ex:
-        logging.error(f"Reddit API error for archived post {archived_submission.id}: {str(ex)}")
-        print(f"Reddit API error for archived post {archived_submission.id}: {str(ex)}")
+        logging.error(f"Reddit API error for archived post {archive_id}: {str(ex)}")
+        print(f"Reddit API error for archived post {archive_id}: {str(ex)}")
     except Exception as e:
-        logging.error(f"General error for archived post {archived_submission.id}: {str(e)}")
-        print(f"General error for archived post {archived_submission.id}: {str(e)}")
+        logging.error(f"General error for archived post {archive_id}: {str(e)}")
+        print(f"General error for archived post {archive_id}: {str(e)}")
 
+metrics.flush(METRICS_FILE, state_store)
 logging.info("Script execution completed.")
 print("Script execution completed.")
\ No newline at end of file
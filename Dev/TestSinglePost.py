@@ -1,5 +1,4 @@
 import praw
-import requests
 import os
 import time
 import logging
@@ -9,6 +8,9 @@ from datetime import datetime, timezone
 from prawcore.exceptions import RequestException, ResponseException
 from praw.exceptions import RedditAPIException
 import config  # Import the config file with credentials
+# Shared helper modules live in the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import http_client  # Shared pooled HTTP session for media fetches
 import subprocess
 import shutil
 
@@ -73,7 +75,7 @@ def download_media(url, file_name):
 
     headers = {'User-Agent': 'Mozilla/5.0'}
     full_path = os.path.join(MEDIA_DOWNLOAD_DIR, file_name)
-    response = requests.get(url, stream=True, headers=headers)
+    response = http_client.get(url, stream=True, headers=headers)
     if response.status_code == 200:
         with open(full_path, 'wb') as out_file:
             for chunk in response.iter_content(chunk_size=1024):
@@ -155,7 +157,7 @@ try:
                         dash_url.replace("DASHPlaylist.mpd", "DASH_480.mp4")
                     ]
                     for url in test_urls:
-                        head_resp = requests.head(url, headers={'User-Agent': 'Mozilla/5.0'})
+                        head_resp = http_client.head(url, headers={'User-Agent': 'Mozilla/5.0'})
                         if head_resp.status_code == 200:
                             img_url = url
                             break
@@ -184,7 +186,7 @@ try:
                 ]
                 video_url = None
                 for url in test_urls:
-                    head_resp = requests.head(url, headers={'User-Agent': 'Mozilla/5.0'})
+                    head_resp = http_client.head(url, headers={'User-Agent': 'Mozilla/5.0'})
                     if head_resp.status_code == 200:
                         video_url = url
                         break
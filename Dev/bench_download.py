@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Shared helper modules live in the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import http_client  # Shared pooled HTTP session
+from media_download import download_file
+
+# Compare download_media's old 1 KB iter_content loop against media_download.download_file
+# using a local HTTP stand-in for the CDN. Usage: python Dev/bench_download.py [size_mb] [runs]
+
+SIZE_MB = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+RUNS = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+PAYLOAD = os.urandom(1024 * 1024) * SIZE_MB
+
+
+class MediaHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+        view = memoryview(PAYLOAD)
+        for start in range(0, len(view), 1024 * 1024):
+            self.wfile.write(view[start:start + 1024 * 1024])
+
+    def log_message(self, format, *args):
+        pass
+
+
+def old_download(url, full_path):
+    # The loop download_media used before media_download
+    response = http_client.get(url, stream=True, headers={'User-Agent': 'Mozilla/5.0'})
+    if response.status_code == 200:
+        with open(full_path, 'wb') as out_file:
+            for chunk in response.iter_content(chunk_size=1024):
+                out_file.write(chunk)
+        return full_path
+    return None
+
+
+def new_download(url, full_path):
+    return download_file(url, full_path, headers={'User-Agent': 'Mozilla/5.0'})
+
+
+def resumable_download(url, full_path):
+    return download_file(url, full_path, headers={'User-Agent': 'Mozilla/5.0'},
+                         partial_dir=os.path.join(os.path.dirname(full_path), ".partial"))
+
+
+def bench(name, download_fn, url, out_dir):
+    timings = []
+    for run in range(RUNS):
+        full_path = os.path.join(out_dir, f"{name}_{run}.mp4")
+        start = time.perf_counter()
+        result = download_fn(url, full_path)
+        timings.append(time.perf_counter() - start)
+        assert result and os.path.getsize(full_path) == len(PAYLOAD), f"{name} produced a bad file"
+        os.remove(full_path)
+    best = min(timings)
+    print(f"{name:>14}: best {best:.2f}s  {SIZE_MB / best:8.1f} MB/s  (runs: {', '.join(f'{t:.2f}' for t in timings)})")
+    return best
+
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), MediaHandler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+url = f"http://127.0.0.1:{server.server_address[1]}/DASH_1080.mp4"
+
+print(f"Downloading {SIZE_MB} MB x {RUNS} runs from {url}")
+with tempfile.TemporaryDirectory() as out_dir:
+    old = bench("iter_content", old_download, url, out_dir)
+    new = bench("download_file", new_download, url, out_dir)
+    bench("resumable", resumable_download, url, out_dir)
+print(f"Speedup: {old / new:.1f}x")
+server.shutdown()
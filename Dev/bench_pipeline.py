@@ -0,0 +1,706 @@
+"""
+End-to-end benchmark of CopyPosts-UFOs_Archives.py and DailyRemovedFlair.py against a local
+stand-in for the Reddit API and the i.redd.it/v.redd.it CDN. Nothing leaves the machine.
+
+The scripts run unmodified, from a temporary copy of the repo with its own config.py and
+praw.ini (oauth_url/reddit_url pointed at the fake API, archive_dir at a scratch folder), so
+a real config.py next to the scripts is never read. The fake API serves submissions from a
+synthetic corpus or from saved fixtures (--fixtures, see replay_fixtures.py), creates archive
+posts for submits, uploads and websockets like Reddit does, and counts every call. The fake
+CDN makes up media on request: noise PNGs, MPD manifests (the recorded ones for fixtures),
+and ffmpeg-generated clips for videos.
+
+    python Dev/bench_pipeline.py --posts 60
+    python Dev/bench_pipeline.py --save baseline.json
+    python Dev/bench_pipeline.py --compare baseline.json      # exits 1 on a regression
+    python Dev/bench_pipeline.py --set ffmpeg_workers=4 --set "duplicate_action='off'"
+
+Needs the same packages as the scripts (praw, requests), plus openssl to make a throwaway
+certificate for the media upload endpoint (PRAW always uploads over https). Video posts are
+left out when ffmpeg isn't installed.
+"""
+import os
+import re
+import ssl
+import sys
+import glob
+import json
+import time
+import zlib
+import base64
+import random
+import shutil
+import struct
+import hashlib
+import sqlite3
+import argparse
+import tempfile
+import threading
+import subprocess
+import collections
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import replay_fixtures  # Fixture file format, shared with capture_fixtures.py
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What gets copied into the scratch app folder
+APP_FILES = ("*.py", "removal_rules.json")
+
+# Synthetic corpus: one of these per post, in turn
+POST_SHAPES = ("image", "self", "gallery", "video", "image", "link", "gallery", "video", "self", "image")
+GALLERY_SIZE = 3
+FLAIRS = ("Sighting", "Photo", "Video", "Discussion")
+
+# Generated media
+IMAGE_SIZE = (800, 600)
+VIDEO_SIZE = "640x360"
+
+# Reddit's hosts in recorded payloads, rewritten to the fake CDN
+MEDIA_HOSTS = ("i.redd.it", "v.redd.it", "preview.redd.it", "external-preview.redd.it")
+
+# Video ID in a v.redd.it path, including gallery and inline videos (v.redd.it/link/<post>/asset/<id>/)
+VIDEO_ID = re.compile(r"/v\.redd\.it/(?:link/[^/]+/asset/)?([A-Za-z0-9]+)")
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+# --- fake media ---
+
+def noise_png(seed, size=IMAGE_SIZE):
+    """Incompressible RGB PNG, different for every seed so no two posts look like duplicates."""
+    width, height = size
+    rng = random.Random(seed)
+    raw = b"".join(b"\x00" + rng.randbytes(width * 3) for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)) +
+            chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b""))
+
+
+def mpd_manifest(seconds):
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" mediaPresentationDuration="PT{seconds}S" type="static">
+  <Period>
+    <AdaptationSet contentType="video" mimeType="video/mp4">
+      <Representation id="360" bandwidth="800000" width="640" height="360"><BaseURL>DASH_360.mp4</BaseURL></Representation>
+    </AdaptationSet>
+    <AdaptationSet contentType="audio" mimeType="audio/mp4">
+      <Representation id="audio" bandwidth="128000"><BaseURL>DASH_AUDIO_128.mp4</BaseURL></Representation>
+    </AdaptationSet>
+  </Period>
+</MPD>
+"""
+
+
+def make_clips(video_ids, out_dir, seconds):
+    """One distinct video and audio track per video ID, made once before the clock starts."""
+    clips = {}
+    for seed, video_id in enumerate(sorted(video_ids), 1):
+        video = os.path.join(out_dir, f"{video_id}_video.mp4")
+        audio = os.path.join(out_dir, f"{video_id}_audio.mp4")
+        subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi",
+                        "-i", f"cellauto=seed={seed}:size={VIDEO_SIZE}:rate=30", "-t", str(seconds),
+                        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-movflags", "+faststart", video],
+                       check=True)
+        subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi",
+                        "-i", f"sine=frequency={200 + seed * 10}:duration={seconds}", "-c:a", "aac", audio],
+                       check=True)
+        with open(video, "rb") as f:
+            video_bytes = f.read()
+        with open(audio, "rb") as f:
+            audio_bytes = f.read()
+        clips[video_id] = (video_bytes, audio_bytes)
+    return clips
+
+
+class MediaStore:
+    """Bytes for a CDN path, generated from the path itself and kept for repeat requests."""
+    def __init__(self, clips, video_seconds, manifests=None):
+        self.clips = clips
+        self.manifests = manifests or {}  # Recorded MPDs by path
+        self.video_seconds = video_seconds
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        with self._lock:
+            if path not in self._cache:
+                self._cache[path] = self._make(path)
+            return self._cache[path]
+
+    def _make(self, path):
+        name = path.rsplit("/", 1)[-1].lower()
+        match = VIDEO_ID.search(path)
+        if name.endswith(".mpd"):
+            if path in self.manifests:
+                return self.manifests[path].encode(), "application/dash+xml"
+            return mpd_manifest(self.video_seconds).encode(), "application/dash+xml"
+        if match or name.endswith(".mp4"):
+            video_id = match.group(1) if match else name
+            clip = self.clips.get(video_id)
+            if not clip:
+                return None, None
+            return (clip[1] if "audio" in name else clip[0]), "video/mp4"
+        if name.endswith((".png", ".jpg", ".jpeg", ".gif", ".webp")):
+            return noise_png(path), "image/png"
+        return None, None
+
+
+# --- corpus ---
+
+def t3(post_id, title, created_utc, **fields):
+    data = {
+        "id": post_id, "name": f"t3_{post_id}", "title": title, "subreddit": "ufos",
+        "author": f"user_{post_id}", "created_utc": created_utc, "permalink": f"/r/ufos/comments/{post_id}/bench/",
+        "url": f"https://www.reddit.com/r/ufos/comments/{post_id}/bench/", "is_self": False, "selftext": "",
+        "link_flair_text": None, "link_flair_template_id": None, "removed_by_category": None,
+        "media": None, "secure_media": None, "is_video": False, "media_metadata": None
+    }
+    data.update(fields)
+    return data
+
+
+def synthetic_corpus(count, cdn, with_video):
+    shapes = [shape for shape in POST_SHAPES if with_video or shape != "video"]
+    posts = []
+    for n in range(count):
+        post_id = f"b{n:05d}"
+        shape = shapes[n % len(shapes)]
+        flair = FLAIRS[n % len(FLAIRS)]
+        fields = {"link_flair_text": flair, "link_flair_template_id": f"src-{flair}"}
+        if shape == "self":
+            fields.update(is_self=True, selftext=f"Benchmark self post {n}. " * 40)
+        elif shape == "image":
+            fields.update(url=f"{cdn}/i.redd.it/{post_id}.png")
+        elif shape == "link":
+            fields.update(url=f"https://example.com/article/{n}")
+        elif shape == "gallery":
+            media_ids = [f"{post_id}g{i}" for i in range(GALLERY_SIZE)]
+            fields.update(
+                is_gallery=True,
+                gallery_data={"items": [{"media_id": media_id, "id": i} for i, media_id in enumerate(media_ids)]},
+                media_metadata={media_id: {"status": "valid", "e": "Image", "m": "image/png",
+                                           "s": {"u": f"{cdn}/preview.redd.it/{media_id}.png?width=800&amp;s=x"}}
+                                for media_id in media_ids},
+                url=f"https://www.reddit.com/gallery/{post_id}"
+            )
+        elif shape == "video":
+            reddit_video = {
+                "fallback_url": f"{cdn}/v.redd.it/{post_id}/DASH_360.mp4?source=fallback",
+                "dash_url": f"{cdn}/v.redd.it/{post_id}/DASHPlaylist.mpd?a=1",
+                "has_audio": True, "is_gif": False, "height": 360, "width": 640, "duration": 10
+            }
+            fields.update(is_video=True, media={"reddit_video": reddit_video}, secure_media={"reddit_video": reddit_video},
+                          url=f"{cdn}/v.redd.it/{post_id}")
+        posts.append(t3(post_id, f"Benchmark {shape} post {n}", 0, **fields))
+    return posts
+
+
+def rehost(text, cdn):
+    for host in MEDIA_HOSTS:
+        text = text.replace(f"https://{host}/", f"{cdn}/{host}/")
+    return text
+
+
+def load_fixtures(fixture_dir, cdn):
+    """
+    Saved fixtures (see replay_fixtures.py) pointed at the fake CDN. Returns the posts and
+    their recorded manifests by CDN path.
+    """
+    posts = []
+    manifests = {}
+    for path, fixture in replay_fixtures.load_fixtures(fixture_dir):
+        data = json.loads(rehost(json.dumps(fixture["data"]), cdn))
+        data.setdefault("name", f"t3_{data['id']}")
+        data.setdefault("removed_by_category", None)
+        posts.append(data)
+        for dash_url, xml_text in fixture["manifests"].items():
+            manifests[urlparse(rehost(dash_url, cdn)).path] = xml_text
+    return posts, manifests
+
+
+def video_ids(posts):
+    found = set()
+    for post in posts:
+        found.update(VIDEO_ID.findall(json.dumps(post)))
+    return found
+
+
+# --- fake Reddit ---
+
+def listing(children, kind="t3"):
+    return {"kind": "Listing", "data": {"children": [{"kind": kind, "data": child} for child in children],
+                                        "after": None, "before": None, "dist": len(children)}}
+
+
+class FakeReddit:
+    """Everything the fake API knows: source posts, archive posts, and what was asked of it."""
+    def __init__(self, source_posts, api_budget):
+        self.lock = threading.Lock()
+        now = time.time()
+        # Newest first, 30s apart, all inside the copier's time window
+        self.source = []
+        for age, post in enumerate(source_posts):
+            post = dict(post, created_utc=now - 60 - age * 30)
+            self.source.append(post)
+        self.by_id = {post["id"]: post for post in self.source}
+        self.archive = []  # newest first
+        self.archive_by_id = {}
+        self.deleted = set()
+        self.api_budget = api_budget
+        self.calls = collections.Counter()  # (account, endpoint)
+        self.used = collections.Counter()  # token -> requests this window
+        self.window_start = now
+        self.cdn_bytes = 0
+        self.upload_bytes = 0
+        self.flaired = 0
+        self.unknown = collections.Counter()
+        self.next_id = 0
+
+    def new_archive_post(self, title, kind, url=None, selftext=""):
+        with self.lock:
+            self.next_id += 1
+            post_id = f"a{self.next_id:05d}"
+        permalink = f"/r/UFOs_Archive/comments/{post_id}/bench/"
+        post = t3(post_id, title, time.time(), subreddit="UFOs_Archive", author="bench_archive",
+                  permalink=permalink, url=url or f"{self.base_url}{permalink}",
+                  is_self=kind == "self", selftext=selftext)
+        with self.lock:
+            self.archive.insert(0, post)
+            self.archive_by_id[post_id] = post
+        return post
+
+    def mark_removed(self, fraction, deleted_fraction, seed=1):
+        rng = random.Random(seed)
+        for post in self.source:
+            roll = rng.random()
+            if roll < deleted_fraction:
+                self.deleted.add(post["id"])
+            elif roll < deleted_fraction + fraction:
+                post["removed_by_category"] = "moderator"
+
+    def reset_counts(self):
+        with self.lock:
+            self.calls.clear()
+            self.cdn_bytes = self.upload_bytes = self.flaired = 0
+
+
+def read_body(handler):
+    if handler.headers.get("Transfer-Encoding", "").lower() == "chunked":  # aiohttp streams some bodies
+        chunks = []
+        while True:
+            size = int(handler.rfile.readline().split(b";")[0], 16)
+            chunks.append(handler.rfile.read(size))
+            handler.rfile.readline()
+            if not size:
+                return b"".join(chunks)
+    length = int(handler.headers.get("Content-Length", 0))
+    return handler.rfile.read(length) if length else b""
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    reddit = None  # FakeReddit, set on the subclass per run
+    media = None  # MediaStore
+
+    def log_message(self, format, *args):
+        pass
+
+    # plumbing
+
+    def _form(self, body):
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            return json.loads(body or b"{}")
+        return {key: values[0] for key, values in parse_qs(body.decode()).items()}
+
+    def _account(self):
+        token = self.headers.get("Authorization", "").replace("bearer ", "")
+        return token.replace("token-", "") or "anonymous", token
+
+    def _send(self, status, payload=b"", content_type="application/json", extra_headers=None, head_only=False):
+        if not isinstance(payload, bytes):
+            payload = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (extra_headers or {}).items():
+            self.send_header(key, value)
+        if self.close_connection:
+            self.send_header("Connection", "close")  # Or aiohttp pools the socket we're about to close
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(payload)
+        return len(payload)
+
+    def _rate_headers(self, token):
+        reddit = self.reddit
+        with reddit.lock:
+            if time.time() - reddit.window_start >= 600:
+                reddit.used.clear()
+                reddit.window_start = time.time()
+            reddit.used[token] += 1
+            used = reddit.used[token]
+            reset = int(600 - (time.time() - reddit.window_start))
+        return {"x-ratelimit-used": str(used), "x-ratelimit-remaining": str(max(reddit.api_budget - used, 0)),
+                "x-ratelimit-reset": str(max(reset, 1))}
+
+    def _api(self, endpoint, payload, status=200):
+        account, token = self._account()
+        with self.reddit.lock:
+            self.reddit.calls[(account, endpoint)] += 1
+        self._send(status, payload, extra_headers=self._rate_headers(token))
+
+    # routing
+
+    def do_HEAD(self):
+        self._cdn(head_only=True)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path, query = url.path.rstrip("/"), parse_qs(url.query)
+        reddit = self.reddit
+        if path.startswith("/ws/"):
+            return self._websocket(path.rsplit("/", 1)[-1])
+        if path.split("/")[1:2] and path.split("/")[1] in MEDIA_HOSTS:
+            return self._cdn()
+        match = re.fullmatch(r"/r/([^/]+)/new", path)
+        if match:
+            posts = reddit.source if match.group(1).lower() == "ufos" else reddit.archive
+            posts = [post for post in posts if post["id"] not in reddit.deleted]
+            before = query.get("before", [None])[0]
+            if before:
+                names = [post["name"] for post in posts]
+                posts = posts[:names.index(before)] if before in names else []
+            limit = int(query.get("limit", [100])[0])
+            return self._api("listing", listing(posts[:limit]))
+        if re.fullmatch(r"/r/[^/]+/api/link_flair(_v2)?", path):
+            return self._api("flair_templates", [{"id": f"tmpl-{text}", "text": text, "text_editable": False,
+                                                  "type": "text", "css_class": ""} for text in FLAIRS])
+        match = re.fullmatch(r"/comments/([^/]+)(/.*)?", path)
+        if match:
+            post = reddit.archive_by_id.get(match.group(1)) or reddit.by_id.get(match.group(1))
+            if not post:
+                return self._api("comments", {"error": 404}, status=404)
+            return self._api("comments", [listing([post]), listing([], kind="t1")])
+        if path == "/api/info":
+            names = ",".join(query.get("id", [])).split(",")
+            found = []
+            for name in names:
+                post_id = name.replace("t3_", "")
+                post = reddit.by_id.get(post_id) or reddit.archive_by_id.get(post_id)
+                if post and post_id not in reddit.deleted:
+                    found.append(post)
+            return self._api("info", listing(found))
+        if path == "/api/v1/me":
+            return self._api("me", {"name": self._account()[0], "id": "bench"})
+        reddit.unknown[f"GET {path}"] += 1
+        self._api("unknown", {"error": 404}, status=404)
+
+    def do_POST(self):
+        path = urlparse(self.path).path.rstrip("/")
+        body = read_body(self)
+        reddit = self.reddit
+        if path == "/api/v1/access_token":
+            client_id = base64.b64decode(self.headers.get("Authorization", "Basic Og==").split()[1]).decode().split(":")[0]
+            return self._send(200, {"access_token": f"token-{client_id}", "token_type": "bearer",
+                                    "expires_in": 86400, "scope": "*"})
+        form = self._form(body)
+        if path == "/api/submit":
+            kind = form.get("kind")
+            if kind in ("image", "video", "videogif"):
+                post = reddit.new_archive_post(form.get("title", ""), kind, url=form.get("url"))
+                return self._api("submit_media", {"json": {"errors": [], "data": {
+                    "user_submitted_page": f"{reddit.base_url}/user/bench_archive/submitted/",
+                    "websocket_url": f"ws://{self.headers['Host']}/ws/{post['id']}"}}})
+            post = reddit.new_archive_post(form.get("title", ""), kind, url=form.get("url"), selftext=form.get("text", ""))
+            return self._api("submit", {"json": {"errors": [], "data": {
+                "url": f"{reddit.base_url}{post['permalink']}", "drafts_count": 0, "id": post["id"], "name": post["name"]}}})
+        if path == "/api/submit_gallery_post.json":
+            post = reddit.new_archive_post(form.get("title", ""), "gallery")
+            return self._api("submit_gallery", {"json": {"errors": [], "data": {
+                "url": f"{reddit.base_url}{post['permalink']}", "id": post["id"]}}})
+        if path == "/api/media/asset.json":
+            asset_id = hashlib.sha1(f"{time.time()}{form.get('filepath')}".encode()).hexdigest()[:12]
+            return self._api("media_asset", {
+                "args": {"action": f"//127.0.0.1:{self.server.upload_port}/upload",
+                         "fields": [{"name": "key", "value": f"rte_images/{asset_id}/{form.get('filepath')}"}]},
+                "asset": {"asset_id": asset_id, "websocket_url": f"ws://{self.headers['Host']}/ws/asset-{asset_id}"}})
+        if path == "/api/comment":
+            comment = {"id": f"c{time.time_ns() % 10 ** 9}", "name": "t1_bench", "body": form.get("text", ""),
+                       "link_id": form.get("thing_id"), "parent_id": form.get("thing_id"), "author": "bench_archive",
+                       "subreddit": "UFOs_Archive", "created_utc": time.time(), "replies": ""}
+            return self._api("comment", {"json": {"errors": [], "data": {"things": [{"kind": "t1", "data": comment}]}}})
+        if re.fullmatch(r"/r/[^/]+/api/(selectflair|flair)", path):
+            post = reddit.archive_by_id.get(form.get("link", "").replace("t3_", ""))
+            if post:
+                post["link_flair_template_id"] = form.get("flair_template_id")
+            with reddit.lock:
+                reddit.flaired += 1
+            return self._api("flair", {"json": {"errors": []}})
+        reddit.unknown[f"POST {path}"] += 1
+        self._api("unknown", {"error": 404}, status=404)
+
+    # CDN
+
+    def _cdn(self, head_only=False):
+        path = urlparse(self.path).path
+        data, content_type = self.media.get(path)
+        if data is None:
+            return self._send(404, b"", content_type="text/plain", head_only=head_only)
+        status, extra = 200, {"Accept-Ranges": "bytes"}
+        match = re.match(r"bytes=(\d+)-", self.headers.get("Range", ""))
+        if match and not head_only:
+            start = int(match.group(1))
+            extra["Content-Range"] = f"bytes {start}-{len(data) - 1}/{len(data)}"
+            data, status = data[start:], 206
+        sent = self._send(status, data, content_type=content_type, extra_headers=extra, head_only=head_only)
+        if not head_only:
+            with self.reddit.lock:
+                self.reddit.cdn_bytes += sent
+
+    # Media posts learn their post URL over a websocket, one text frame and done
+
+    def _websocket(self, post_id):
+        accept = base64.b64encode(hashlib.sha1((self.headers["Sec-WebSocket-Key"] + WEBSOCKET_GUID).encode()).digest()).decode()
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        post = self.reddit.archive_by_id.get(post_id)
+        message = {"type": "success", "payload": {"redirect": f"{self.reddit.base_url}{post['permalink']}"}} if post \
+            else {"type": "failed", "payload": {}}
+        payload = json.dumps(message).encode()
+        header = bytes([0x81, len(payload)]) if len(payload) < 126 else bytes([0x81, 126]) + struct.pack(">H", len(payload))
+        self.wfile.write(header + payload)
+        self.wfile.flush()
+        # Wait for the client's close frame, then answer it
+        try:
+            head = self.rfile.read(2)
+            if len(head) == 2:
+                length = head[1] & 0x7F
+                self.rfile.read(length + (4 if head[1] & 0x80 else 0))
+            self.wfile.write(b"\x88\x00")
+        except OSError:
+            pass
+        self.close_connection = True
+
+
+class UploadHandler(BaseHTTPRequestHandler):
+    """Stands in for the S3 bucket media uploads go to."""
+    reddit = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = len(read_body(self))
+        with self.reddit.lock:
+            self.reddit.upload_bytes += length
+        self.send_response(201)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+def make_certificate(out_dir):
+    cert, key = os.path.join(out_dir, "cert.pem"), os.path.join(out_dir, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-keyout", key, "-out", cert,
+                    "-days", "1", "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1"],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return cert, key
+
+
+def start_servers(reddit, media, work_dir):
+    api_handler = type("BenchApiHandler", (ApiHandler,), {"reddit": reddit, "media": media})
+    upload_handler = type("BenchUploadHandler", (UploadHandler,), {"reddit": reddit})
+    api = ThreadingHTTPServer(("127.0.0.1", 0), api_handler)
+    api.daemon_threads = True
+    upload = ThreadingHTTPServer(("127.0.0.1", 0), upload_handler)
+    upload.daemon_threads = True
+    cert, key = make_certificate(work_dir)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    upload.socket = context.wrap_socket(upload.socket, server_side=True)
+    api.upload_port = upload.server_address[1]
+    reddit.base_url = f"http://127.0.0.1:{api.server_address[1]}"
+    for server in (api, upload):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return api, upload, cert
+
+
+# --- running the scripts ---
+
+def prepare_app(work_dir, base_url, settings):
+    """Copy the scripts into work_dir/app with a bench config.py and praw.ini."""
+    app_dir = os.path.join(work_dir, "app")
+    archive_dir = os.path.join(work_dir, "archive")
+    os.makedirs(app_dir)
+    os.makedirs(archive_dir)
+    for pattern in APP_FILES:
+        for path in glob.glob(os.path.join(REPO_DIR, pattern)):
+            if os.path.basename(path) != "config.py":
+                shutil.copy(path, app_dir)
+    lines = []
+    for account, username in (("source", "bench_source"), ("destination", "bench_archive")):
+        lines += [f'{account}_client_id = "{account}"', f'{account}_client_secret = "secret"',
+                  f'{account}_password = "password"', f'{account}_username = "{username}"',
+                  f'{account}_user_agent = "bench_pipeline"']
+    lines += [f"archive_dir = {archive_dir!r}"] + list(settings)
+    with open(os.path.join(app_dir, "config.py"), "w") as f:
+        f.write("\n".join(lines) + "\n")
+    # PRAW only takes its endpoints from praw.ini (or Reddit() arguments), the working directory's copy wins
+    with open(os.path.join(app_dir, "praw.ini"), "w") as f:
+        f.write(f"[DEFAULT]\noauth_url={base_url}\nreddit_url={base_url}\nshort_url={base_url}\ncheck_for_updates=False\n")
+    return app_dir, archive_dir
+
+
+def run_script(app_dir, cert, script, *args):
+    # requests (praw) and aiohttp (asyncpraw) each take the upload certificate from a different variable
+    env = dict(os.environ, REQUESTS_CA_BUNDLE=cert, SSL_CERT_FILE=cert, PYTHONDONTWRITEBYTECODE="1")
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, script, *args], cwd=app_dir, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        print(result.stdout[-2000:], result.stderr[-4000:], sep="\n")
+        raise SystemExit(f"{script} exited with {result.returncode}")
+    return elapsed, result.stdout
+
+
+def archived_count(archive_dir):
+    with sqlite3.connect(os.path.join(archive_dir, "archive_state.db")) as conn:
+        return dict(conn.execute("SELECT status, COUNT(*) FROM posts GROUP BY status").fetchall())
+
+
+def api_calls(reddit):
+    return sum(count for (account, endpoint), count in reddit.calls.items())
+
+
+def summarize_calls(reddit):
+    per_endpoint = collections.Counter()
+    for (account, endpoint), count in reddit.calls.items():
+        per_endpoint[f"{account}:{endpoint}"] += count
+    return dict(per_endpoint.most_common())
+
+
+# --- reporting ---
+
+def compare(results, baseline_path, tolerance):
+    """Flag throughput drops and API call growth beyond tolerance. Returns True if anything regressed."""
+    with open(baseline_path, "r") as f:
+        baseline = json.load(f)
+    regressed = False
+    checks = (("copy", "posts_per_min", -1), ("copy", "bytes_per_sec", -1), ("copy", "api_calls_per_post", 1),
+              ("removal", "posts_per_min", -1), ("removal", "api_calls_per_post", 1))
+    print(f"\nAgainst {baseline_path} (tolerance {tolerance:.0%}):")
+    for phase, key, worse in checks:
+        old, new = baseline.get(phase, {}).get(key), results.get(phase, {}).get(key)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        bad = change * worse > tolerance
+        regressed = regressed or bad
+        print(f"  {phase:>8} {key:<20} {old:>12.2f} -> {new:>12.2f}  {change:+7.1%}{'  REGRESSION' if bad else ''}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the copier and the removal checker.")
+    parser.add_argument("--posts", type=int, default=50, help="synthetic posts to copy (max 100, one /new page)")
+    parser.add_argument("--fixtures", metavar="DIR", help="saved fixtures to use instead, e.g. Dev/fixtures")
+    parser.add_argument("--video-seconds", type=int, default=10, help="length of generated clips")
+    parser.add_argument("--api-budget", type=int, default=100000,
+                        help="requests per 10 minute window per account; 1000 paces requests like Reddit does")
+    parser.add_argument("--removed", type=float, default=0.2, help="share of posts removed before the removal check")
+    parser.add_argument("--deleted", type=float, default=0.05, help="share of posts deleted before the removal check")
+    parser.add_argument("--copier-args", default="", help="extra copier arguments, e.g. --async")
+    parser.add_argument("--set", dest="settings", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra config.py line, e.g. ffmpeg_workers=4")
+    parser.add_argument("--save", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="compare with results saved earlier, exit 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch folder (logs, state, metrics)")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    try:
+        have_ffmpeg = shutil.which("ffmpeg") is not None
+        cdn = "http://cdn.invalid"  # Placeholder until the server has a port
+        posts, manifests = load_fixtures(args.fixtures, cdn) if args.fixtures else \
+            (synthetic_corpus(min(args.posts, 100), cdn, with_video=have_ffmpeg), {})
+        if not have_ffmpeg:
+            print("ffmpeg not found, leaving video posts out.")
+        clips = make_clips(video_ids(posts), work_dir, args.video_seconds) if have_ffmpeg else {}
+
+        reddit = FakeReddit(posts, args.api_budget)
+        api, upload, cert = start_servers(reddit, MediaStore(clips, args.video_seconds, manifests), work_dir)
+        # Now that the port is known, point the corpus at it
+        for post in reddit.source:
+            for key, value in list(post.items()):
+                if isinstance(value, (str, dict)):
+                    post[key] = json.loads(json.dumps(value).replace(cdn, reddit.base_url)) if isinstance(value, dict) \
+                        else value.replace(cdn, reddit.base_url)
+
+        app_dir, archive_dir = prepare_app(work_dir, reddit.base_url, args.settings)
+        print(f"{len(posts)} posts ({'recorded' if args.fixtures else 'synthetic'}), scratch folder {work_dir}")
+
+        # Copy run
+        elapsed, _ = run_script(app_dir, cert, "CopyPosts-UFOs_Archives.py", "24h", *args.copier_args.split())
+        statuses = archived_count(archive_dir)
+        copied = sum(statuses.values())
+        media_bytes = reddit.cdn_bytes + reddit.upload_bytes
+        results = {"posts": len(posts), "copy": {
+            "seconds": round(elapsed, 3), "posts": copied, "statuses": statuses,
+            "posts_per_min": round(copied / elapsed * 60, 2),
+            "cdn_bytes": reddit.cdn_bytes, "upload_bytes": reddit.upload_bytes,
+            "bytes_per_sec": round(media_bytes / elapsed, 1),
+            "api_calls": api_calls(reddit), "api_calls_per_post": round(api_calls(reddit) / max(copied, 1), 3),
+            "calls": summarize_calls(reddit)
+        }}
+
+        # Removal check over everything just archived
+        reddit.mark_removed(args.removed, args.deleted)
+        reddit.reset_counts()
+        elapsed, output = run_script(app_dir, cert, "DailyRemovedFlair.py")
+        match = re.search(r"(\d+) archived posts due", output)
+        checked = int(match.group(1)) if match else 0
+        results["removal"] = {
+            "seconds": round(elapsed, 3), "posts": checked, "flaired": reddit.flaired,
+            "posts_per_min": round(checked / elapsed * 60, 2),
+            "api_calls": api_calls(reddit), "api_calls_per_post": round(api_calls(reddit) / max(checked, 1), 3),
+            "calls": summarize_calls(reddit)
+        }
+        api.shutdown()
+        upload.shutdown()
+
+        copy, removal = results["copy"], results["removal"]
+        print(f"\nCopy:     {copy['posts']} posts in {copy['seconds']:.1f}s -> {copy['posts_per_min']:.1f} posts/min "
+              f"({', '.join(f'{count} {status}' for status, count in statuses.items())})")
+        print(f"          {copy['cdn_bytes'] / 1e6:.1f} MB downloaded, {copy['upload_bytes'] / 1e6:.1f} MB uploaded "
+              f"-> {copy['bytes_per_sec'] / 1e6:.2f} MB/s")
+        print(f"          {copy['api_calls']} API calls, {copy['api_calls_per_post']:.2f} per post")
+        print(f"Removals: {removal['posts']} posts in {removal['seconds']:.1f}s -> {removal['posts_per_min']:.1f} posts/min, "
+              f"{removal['flaired']} flaired")
+        print(f"          {removal['api_calls']} API calls, {removal['api_calls_per_post']:.2f} per post")
+        print("\nAPI calls by account:endpoint")
+        for phase in ("copy", "removal"):
+            print(f"  {phase}: " + ", ".join(f"{name} {count}" for name, count in results[phase]["calls"].items()))
+        if reddit.unknown:
+            print(f"Unhandled requests: {dict(reddit.unknown)}")
+
+        if args.save:
+            with open(args.save, "w") as f:
+                json.dump(results, f, indent=2)
+        if args.compare and compare(results, args.compare, args.tolerance):
+            sys.exit(1)
+    finally:
+        if args.keep:
+            print(f"Kept {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
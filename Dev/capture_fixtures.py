@@ -0,0 +1,105 @@
+"""
+Save submissions as fixtures for replay_fixtures.py and bench_pipeline.py --fixtures.
+
+Like debug_post.py, but keeps the whole payload exactly as the API returns it (the same
+data the copier's listing gets), fetches the DASH manifests its videos point to, and
+records what the copier currently makes of it as the expected result.
+
+    python Dev/capture_fixtures.py 1abcde2 https://www.reddit.com/r/UFOs/comments/1abcde3/...
+    python Dev/capture_fixtures.py --new 100             # the source subreddit's newest posts
+    python Dev/capture_fixtures.py --out /tmp/fixtures 1abcde2
+
+Payloads include usernames and post text, keep them out of public forks if that matters.
+"""
+import os
+import sys
+import argparse
+
+# Shared helper modules live in the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import praw
+import config  # assumes you have a config.py with Reddit credentials
+import http_client  # Shared pooled HTTP session
+from replay_fixtures import FIXTURE_DIR, dash_urls, offline_reddit, resolve_fixture, shape_of, write_fixture
+
+SOURCE_SUBREDDIT = "ufos"
+
+# /api/info takes at most this many fullnames per request
+INFO_BATCH = 100
+
+# Same account the copier reads the source subreddit with
+reddit = praw.Reddit(
+    client_id=config.source_client_id,
+    client_secret=config.source_client_secret,
+    password=config.source_password,
+    username=config.source_username,
+    user_agent=config.source_user_agent
+)
+
+
+def fullname(arg):
+    """Post ID, t3_ fullname or a link to the post."""
+    if arg.startswith("t3_"):
+        return arg
+    if "/" in arg:
+        return "t3_" + praw.models.Submission.id_from_url(arg)
+    return "t3_" + arg
+
+
+def fetch_payloads(names):
+    # reddit.request returns the parsed JSON without turning it into PRAW objects
+    payloads = []
+    for start in range(0, len(names), INFO_BATCH):
+        listing = reddit.request(method="GET", path="api/info", params={"id": ",".join(names[start:start + INFO_BATCH])})
+        payloads += [child["data"] for child in listing["data"]["children"]]
+    return payloads
+
+
+def fetch_new(limit):
+    listing = reddit.request(method="GET", path=f"r/{SOURCE_SUBREDDIT}/new", params={"limit": limit})
+    return [child["data"] for child in listing["data"]["children"]]
+
+
+def fetch_manifests(offline, data):
+    """The MPD behind every dash URL the copier would read for this post, by URL."""
+    snapshot, _ = resolve_fixture(offline, {"data": data, "manifests": {}})
+    manifests = {}
+    for dash_url, _ in dash_urls(snapshot["media"]):
+        try:
+            response = http_client.get(dash_url)
+            if response.status_code == 200:
+                manifests[dash_url] = response.text
+            else:
+                print(f"  Manifest for {data['id']} returned {response.status_code}: {dash_url}")
+        except Exception as e:
+            print(f"  Failed to fetch manifest for {data['id']}: {str(e)}")
+    return manifests
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Save submission payloads as replay fixtures.")
+    parser.add_argument("posts", nargs="*", help="post IDs, t3_ fullnames or links")
+    parser.add_argument("--new", type=int, metavar="N", help=f"also save the newest N posts in r/{SOURCE_SUBREDDIT} (max 100)")
+    parser.add_argument("--out", default=FIXTURE_DIR, help="fixture folder (default Dev/fixtures)")
+    parser.add_argument("--no-manifests", action="store_true", help="don't fetch DASH manifests")
+    args = parser.parse_args()
+    if not args.posts and not args.new:
+        parser.error("give post IDs or --new N")
+
+    payloads = fetch_payloads([fullname(arg) for arg in args.posts]) if args.posts else []
+    if args.new:
+        payloads += fetch_new(min(args.new, 100))
+
+    os.makedirs(args.out, exist_ok=True)
+    offline = offline_reddit()
+    for data in payloads:
+        fixture = {"data": data, "manifests": {} if args.no_manifests else fetch_manifests(offline, data)}
+        snapshot, fixture["expected"] = resolve_fixture(offline, fixture)
+        path = os.path.join(args.out, f"{data['id']}.json")
+        write_fixture(path, fixture)
+        print(f"Saved {path}: {shape_of(snapshot)}, {len(fixture['manifests'])} manifests")
+    print(f"{len(payloads)} fixtures saved.")
+
+
+if __name__ == "__main__":
+    main()
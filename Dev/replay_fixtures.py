@@ -0,0 +1,239 @@
+"""
+Replay saved submissions through the copier's media resolution, offline.
+
+Each fixture is one submission as Reddit's API returns it ({"kind": "t3", "data": {...}}),
+plus the DASH manifests its videos point to and what the copier made of it when it was
+saved. Dev/fixtures has one hand-written payload per media shape; capture_fixtures.py adds
+real ones. For every fixture the runner builds the PRAW Submission the listing would give,
+runs media_resolver.snapshot_submission, and for each saved manifest picks the renditions and
+makes the upload decision (sizes estimated from bandwidth, as no HEAD requests are made).
+
+    python Dev/replay_fixtures.py                        # check results still match, exit 1 if not
+    python Dev/replay_fixtures.py --repeat 2000          # throughput per shape
+    python Dev/replay_fixtures.py --repeat 500 --profile
+    python Dev/replay_fixtures.py --update               # accept the current results
+
+Attributes a payload doesn't have make PRAW fetch the whole post, an API call per submission
+in production. Those are counted instead of made, and reported.
+"""
+import os
+import sys
+import glob
+import json
+import time
+import pstats
+import logging
+import argparse
+import cProfile
+import collections
+
+# Shared helper modules live in the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import praw
+from praw.models import Submission
+import dash_manifest  # DASHPlaylist.mpd parser
+import media_probe
+from media_resolver import snapshot_submission
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+# --- fixture files ---
+
+def read_fixture(path):
+    """A fixture file as {"data", "manifests", "expected"}. Bare t3 data without the wrapper works too."""
+    with open(path, "r") as f:
+        raw = json.load(f)
+    if raw.get("kind") == "t3":
+        return {"data": raw["data"], "manifests": raw.get("manifests") or {}, "expected": raw.get("expected")}
+    return {"data": raw, "manifests": {}, "expected": None}
+
+
+def write_fixture(path, fixture):
+    with open(path, "w") as f:
+        json.dump({"kind": "t3", "data": fixture["data"], "manifests": fixture["manifests"],
+                   "expected": fixture["expected"]}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load_fixtures(fixture_dir=FIXTURE_DIR):
+    return [(path, read_fixture(path)) for path in sorted(glob.glob(os.path.join(fixture_dir, "*.json")))]
+
+
+# --- offline PRAW ---
+
+class OfflineSubmission(Submission):
+    """
+    Submission that never goes to the network. Where PRAW would fetch the post to look for a
+    missing attribute, the attribute name is counted and the lookup fails as it would after
+    the fetch.
+    """
+    lazy_fetches = collections.Counter()
+
+    def __getattr__(self, attribute):
+        if not attribute.startswith("_") and not self.__dict__.get("_fetched"):
+            OfflineSubmission.lazy_fetches[attribute] += 1
+            self._fetched = True
+        raise AttributeError(f"{self.__class__.__name__!r} object has no attribute {attribute!r}")
+
+    def _fetch(self):
+        raise RuntimeError("replay is offline, nothing can be fetched")
+
+
+def offline_reddit():
+    # Read-only and never used for a request, the credentials only have to be present
+    return praw.Reddit(client_id="replay", client_secret="replay", user_agent="replay_fixtures", check_for_updates=False)
+
+
+# --- resolution ---
+
+def dash_urls(media):
+    """Every manifest the copier would fetch for this media, with whether it wants the audio track."""
+    urls = []
+    if media["dash_url"]:
+        urls.append((media["dash_url"], media["has_audio"] and not media["is_gif"]))
+    for item in media["gallery_items"]:
+        if not item["url"] and item["dash_url"]:
+            urls.append((item["dash_url"], False))
+    return urls
+
+
+def resolve_fixture(reddit, fixture):
+    """Everything the copier decides about a submission before downloading anything."""
+    # What the listing builds from each child's data, author and subreddit become objects the same way
+    submission = OfflineSubmission(reddit, _data=fixture["data"])
+    snapshot = snapshot_submission(submission)
+    video_plans = {}
+    for dash_url, want_audio in dash_urls(snapshot["media"]):
+        xml_text = fixture["manifests"].get(dash_url)
+        if xml_text is None:
+            continue
+        manifest = dash_manifest.parse_manifest(xml_text.encode(), dash_url)
+        video_plans[dash_url] = media_probe.probe_manifest(manifest, want_audio=want_audio, sizes={})
+    return snapshot, {"media": snapshot["media"], "video_plans": video_plans}
+
+
+def shape_of(snapshot):
+    media = snapshot["media"]
+    if media["type"] == "gallery":
+        if any(not item["url"] for item in media["gallery_items"]):
+            return "gallery_video"
+        if any(item["url"].endswith((".gif", ".mp4")) for item in media["gallery_items"]):
+            return "gallery_animated"
+        return "gallery"
+    if media["type"] == "video":
+        if snapshot["is_self"]:
+            return "self_video"
+        return "video_gif" if media["is_gif"] else "video"
+    if media["type"] == "link" and snapshot["is_self"]:
+        return "self"
+    return media["type"]
+
+
+def differences(expected, actual, prefix=""):
+    """Paths where two results differ, e.g. media.gallery_items[1].url"""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        found = []
+        for key in sorted(set(expected) | set(actual)):
+            found += differences(expected.get(key), actual.get(key), f"{prefix}.{key}" if prefix else key)
+        return found
+    if isinstance(expected, list) and isinstance(actual, list) and len(expected) == len(actual):
+        found = []
+        for index, (old, new) in enumerate(zip(expected, actual)):
+            found += differences(old, new, f"{prefix}[{index}]")
+        return found
+    return [] if expected == actual else [prefix or "(root)"]
+
+
+# --- runs ---
+
+def check(reddit, fixtures, update):
+    """Resolve every fixture once against its expected result. Returns {path: shape} and the failure count."""
+    shapes = {}
+    failures = 0
+    for path, fixture in fixtures:
+        name = os.path.basename(path)
+        try:
+            snapshot, result = resolve_fixture(reddit, fixture)
+        except Exception as e:
+            print(f"  {name}: failed to resolve: {str(e)}")
+            failures += 1
+            continue
+        shapes[path] = shape_of(snapshot)
+        result = json.loads(json.dumps(result))  # Tuples to lists, as saved
+        if update:
+            if result != fixture["expected"]:
+                fixture["expected"] = result
+                write_fixture(path, fixture)
+                print(f"  {name}: expected result updated")
+        elif fixture["expected"] is None:
+            print(f"  {name}: no expected result saved, run with --update")
+        elif result != fixture["expected"]:
+            print(f"  {name}: resolves differently now: {', '.join(differences(fixture['expected'], result))}")
+            failures += 1
+    return shapes, failures
+
+
+def replay(reddit, fixtures, shapes, repeat):
+    """Resolve every fixture repeat times. Returns seconds spent per shape and the number of resolves per shape."""
+    seconds = collections.Counter()
+    counts = collections.Counter()
+    work = [(fixture, shapes[path]) for path, fixture in fixtures if path in shapes]
+    for _ in range(repeat):
+        for fixture, shape in work:
+            start = time.perf_counter()
+            resolve_fixture(reddit, fixture)
+            seconds[shape] += time.perf_counter() - start
+            counts[shape] += 1
+    return seconds, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay saved submissions through media resolution, offline.")
+    parser.add_argument("fixture_dir", nargs="?", default=FIXTURE_DIR)
+    parser.add_argument("--repeat", type=int, default=200, help="passes over the fixtures for timing (0 to only check)")
+    parser.add_argument("--profile", action="store_true", help="run the timing passes under cProfile")
+    parser.add_argument("--update", action="store_true", help="save the current results as expected")
+    args = parser.parse_args()
+
+    # Failed gallery items and found dash URLs are logged per submission, thousands of times here
+    logging.disable(logging.WARNING)
+    fixtures = load_fixtures(args.fixture_dir)
+    if not fixtures:
+        sys.exit(f"No fixtures in {args.fixture_dir}")
+    reddit = offline_reddit()
+
+    print(f"Checking {len(fixtures)} fixtures in {args.fixture_dir}")
+    shapes, failures = check(reddit, fixtures, args.update)
+    lazy_fetches = dict(OfflineSubmission.lazy_fetches)
+    if not args.update:
+        print(f"{len(fixtures) - failures} of {len(fixtures)} resolve as expected.")
+    for shape, count in sorted(collections.Counter(shapes.values()).items()):
+        print(f"  {shape:<18} {count}")
+    if lazy_fetches:
+        fetching = sum(lazy_fetches.values())
+        print(f"{fetching} of {len(shapes)} submissions would make PRAW fetch the post (an API call each), "
+              f"first missing attribute: {', '.join(f'{name} {count}' for name, count in lazy_fetches.items())}")
+
+    if args.repeat:
+        profiler = cProfile.Profile() if args.profile else None
+        if profiler:
+            profiler.enable()
+        start = time.perf_counter()
+        seconds, counts = replay(reddit, fixtures, shapes, args.repeat)
+        elapsed = time.perf_counter() - start
+        if profiler:
+            profiler.disable()
+        total = sum(counts.values())
+        print(f"\n{total} submissions in {elapsed:.2f}s -> {total / elapsed:,.0f} per second")
+        for shape in sorted(counts):
+            print(f"  {shape:<18} {seconds[shape] / counts[shape] * 1e6:8.1f} us each")
+        if profiler:
+            print()
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
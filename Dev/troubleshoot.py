@@ -1,9 +1,11 @@
 import sys
 import os
 import praw
-import requests
 import logging
 import config  # Import the config file with credentials
+# Shared helper modules live in the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import http_client  # Shared pooled HTTP session
 from RedDownloader import RedDownloader
 from prawcore.exceptions import NotFound, Forbidden
 
@@ -31,8 +33,8 @@ reddit = praw.Reddit(
     user_agent=config.source_user_agent
 )
 
-# Create a requests session for HTML fallbacks
-session = requests.Session()
+# Create a pooled session for HTML fallbacks
+session = http_client.build_session()
 session.headers.update({
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
     'Referer': 'https://www.reddit.com/',
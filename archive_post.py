@@ -0,0 +1,112 @@
+# Pieces of an archive post shared by the sync and async copiers
+import os
+import logging
+from state_store import STATUS_DUPLICATE
+
+# Reddit's comment length limit
+MAX_COMMENT_LENGTH = 10000
+
+
+def split_text(text, max_length=MAX_COMMENT_LENGTH):
+    chunks = []
+    while len(text) > max_length:
+        split_point = text.rfind("\n", 0, max_length)
+        if split_point == -1:
+            split_point = max_length
+        chunks.append(text[:split_point])
+        text = text[split_point:].lstrip()
+    chunks.append(text)
+    return chunks
+
+
+def get_audio_url_from_fallback(video_url):
+    """
+    Construct the CMAF_AUDIO_64 URL from the fallback video URL. Only used when the DASH manifest can't be read,
+    normally the audio URL comes straight from the MPD via dash_manifest.
+    """
+    if not video_url:
+        return None
+    return video_url.rsplit('/', 1)[0] + "/CMAF_AUDIO_64.mp4"
+
+
+def duplicate_note(source_id, archive_id):
+    return f"Near-duplicate of an earlier post ({source_id}), [archived here](https://www.reddit.com/comments/{archive_id}/)."
+
+
+def build_comment(post, prepared):
+    """Info comment left on the archive post, from the post snapshot and the prepared media."""
+    comment_body = f"**Original post by u/{post['author']}:** [Here](https://www.reddit.com{post['permalink']})\n"
+    comment_body += f"\n**Original Post ID:** {post['id']}"
+    if prepared["original_media_url"]:
+        comment_body += f"\n\n**Direct link to media:** [Media Here]({prepared['original_media_url']})"
+    if prepared["audio_url"]:
+        comment_body += f"\n\n**Direct link to Audio:** [Audio Here]({prepared['audio_url']})"
+    if prepared["upload_note"]:
+        comment_body += f"\n\n**Archive note:** {prepared['upload_note']}"
+    if post["selftext"]:
+        comment_body += f"\n\n**Original post text:** {post['selftext']}"
+        comment_body += "\n\n---\n\n"
+    if post["link_flair_template_id"]:
+        comment_body += f"\n\n**Original Flair ID:** {post['link_flair_template_id']}\n"
+    if post["link_flair_text"]:
+        comment_body += f"\n**Original Flair Text:** {post['link_flair_text']}"
+    return comment_body
+
+
+def submission_request(post, prepared, subreddit_name):
+    """
+    How the archive post goes up: (subreddit submit method name, its keyword arguments),
+    or None when there's nothing to submit. Both copiers call exactly this.
+    """
+    title = post["title"]
+    gallery_images = prepared["gallery_images"]
+    media_url = prepared["media_url"]
+
+    # If self post
+    if post["is_self"]:
+        return "submit", {"title": title, "selftext": post["selftext"]}
+    if prepared["duplicate_of"]:
+        # Point at the earlier archive copy instead of uploading the same media again
+        earlier_archive_id = prepared["duplicate_of"]["archive_id"]
+        return "submit", {"title": title, "url": f"https://www.reddit.com/r/{subreddit_name}/comments/{earlier_archive_id}/"}
+    if gallery_images:
+        if len(gallery_images) >= 2:
+            return "submit_gallery", {"title": title, "images": [{'image_path': path} for path in gallery_images]}
+        # Reddit requires at least 2 images for galleries
+        return "submit_image", {"title": title, "image_path": gallery_images[0]}
+    if media_url and os.path.exists(media_url) and os.path.getsize(media_url) > 0:
+        if media_url.endswith(('jpg', 'jpeg', 'png', 'gif')):
+            return "submit_image", {"title": title, "image_path": media_url}
+        if media_url.endswith('mp4'):
+            return "submit_video", {"title": title, "video_path": media_url}
+        return None
+    if post["url"] and post["url"].startswith("http"):
+        return "submit", {"title": title, "url": post["url"]}
+    logging.error(f"Cannot submit post {post['id']}: missing media and invalid URL.")
+    return None
+
+
+def record_duplicate(state_store, post, prepared):
+    """duplicate_action "skip": mark the post done without an archive copy."""
+    state_store.record_archived(
+        post["id"],
+        media_urls=[prepared["original_media_url"]],
+        flair_text=post["link_flair_text"],
+        flair_id=post["link_flair_template_id"],
+        source_created_utc=post["created_utc"],
+        status=STATUS_DUPLICATE
+    )
+
+
+def record_archive(state_store, duplicate_index, post, prepared, new_post):
+    state_store.record_archived(
+        post["id"],
+        archive_id=new_post.id,
+        media_urls=[prepared["original_media_url"], prepared["audio_url"]],
+        flair_text=post["link_flair_text"],
+        flair_id=post["link_flair_template_id"],
+        source_created_utc=post["created_utc"]
+    )
+    # Duplicates point at the earlier post's fingerprint already
+    if prepared["fingerprint"] and not prepared["duplicate_of"]:
+        duplicate_index.add(post["id"], *prepared["fingerprint"])
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+import asyncpraw
+from asyncprawcore import Requestor
+from asyncprawcore.exceptions import RequestException, ResponseException
+from asyncpraw.exceptions import RedditAPIException
+import config  # Import the config file with credentials
+import metrics
+from media_resolver import snapshot_submission
+from rate_limiter import RedditRateLimiter
+from flair_cache import FlairTemplateCache
+from duplicate_index import DUPLICATE_ACTION
+from archive_post import build_comment, split_text, submission_request, record_duplicate, record_archive
+from structured_log import start_trace, traced, timed, finish_trace
+
+
+class AsyncCopier:
+    """
+    CopyPosts-UFOs_Archives.py on asyncpraw. Same filtering, cursor, flair and comments as the
+    sync pipeline, with listing, submits, flair and comments on one event loop. Media goes
+    through the sync copier's MediaPreparer in threads and posts go up through the same
+    archive_post helpers, so the two copiers only differ in how they talk to Reddit.
+    Both accounts share one rate limiter.
+    """
+    def __init__(self, state_store, preparer, duplicate_index, flair_cache_file,
+                 listing_floor=None, prefetch_posts=6):
+        self.state_store = state_store
+        self.preparer = preparer
+        self.duplicate_index = duplicate_index
+        self.flair_cache_file = flair_cache_file
+        self.listing_floor = listing_floor
+        self.prefetch_posts = prefetch_posts
+
+    async def run(self, cutoff_time, listed_posts):
+        """Copy every new post since cutoff_time. Fills listed_posts like the sync lister."""
+        source_reddit = asyncpraw.Reddit(
+            client_id=config.source_client_id,
+            client_secret=config.source_client_secret,
+            password=config.source_password,
+            username=config.source_username,
+            user_agent=config.source_user_agent,
+            requestor_class=metrics.counting_requestor(Requestor, "source")
+        )
+        archives_reddit = asyncpraw.Reddit(
+            client_id=config.destination_client_id,
+            client_secret=config.destination_client_secret,
+            password=config.destination_password,
+            username=config.destination_username,
+            user_agent=config.destination_user_agent,
+            ratelimit_seconds=300,  # Let PRAW wait out "doing that too much" on submissions instead of failing
+            requestor_class=metrics.counting_requestor(Requestor, "archive")
+        )
+        async with source_reddit, archives_reddit:
+            self.source_subreddit = await source_reddit.subreddit('ufos')
+            self.destination_subreddit = await archives_reddit.subreddit('UFOs_Archive')
+            self.rate_limiter = RedditRateLimiter(source_reddit, archives_reddit)
+            self.flair_cache = FlairTemplateCache(self.destination_subreddit, self.flair_cache_file)
+
+            # Bounded so listing stays at most prefetch_posts ahead of the submitter
+            ready_queue = asyncio.Queue(maxsize=self.prefetch_posts)
+            lister = asyncio.create_task(self.list_new_posts(cutoff_time, listed_posts, ready_queue))
+            while True:
+                item = await ready_queue.get()
+                if item is None:
+                    break
+                post, task = item
+                await self.archive_post(post, task)
+            await lister
+
+    # --- listing ---
+
+    async def new_posts_listing(self, cutoff_time):
+        """Same rules as the sync new_posts_listing(): /new down to the listing floor (the cutoff without one)."""
+        floor = self.listing_floor or cutoff_time.timestamp()
+        posts = []
+        async for submission in self.source_subreddit.new(limit=None):
+            if submission.created_utc < floor:
+                break
+            posts.append(submission)
+        return posts
+
+    async def list_new_posts(self, cutoff_time, listed_posts, ready_queue):
+        try:
+            with timed("listing"):
+                submissions = await self.new_posts_listing(cutoff_time)
+            for submission in submissions:
+                try:
+                    logging.info(f"Processing submission: {submission.title}, Flair: {submission.link_flair_text}, Created: {submission.created_utc}")
+
+                    # /new is newest first, everything past the cutoff is older still
+                    post_time = datetime.fromtimestamp(submission.created_utc, timezone.utc)
+                    if post_time < cutoff_time:
+                        break
+
+                    listed_posts.append((submission.fullname, submission.created_utc, submission.id))
+                    if self.state_store.is_processed(submission.id):
+                        continue
+
+                    post = start_trace(snapshot_submission(submission))
+                    await ready_queue.put((post, asyncio.create_task(self.prepare_media(post))))
+                except (RequestException, ResponseException, RedditAPIException) as ex:
+                    logging.error(f"Error for post {submission.id}: {str(ex)}")
+                except Exception as e:
+                    logging.error(f"General error for post {submission.id}: {str(e)}")
+        except Exception as e:
+            logging.error(f"Failed to list new posts: {str(e)}")
+        finally:
+            await ready_queue.put(None)
+
+    # --- prepare stage ---
+
+    async def prepare_media(self, post):
+        # The sync copier's prepare stage, in a thread: same media decisions, resumable downloads,
+        # cache and per-host limits. Several posts prepare at once while the loop lists and submits
+        return await asyncio.to_thread(self.preparer.prepare_media, post)
+
+    # --- submit stage ---
+
+    async def submit_post(self, post, prepared):
+        request = submission_request(post, prepared, self.destination_subreddit.display_name)
+        if not request:
+            return None
+        method, kwargs = request
+        await self.rate_limiter.wait_async()
+        with timed("submit"):
+            new_post = await getattr(self.destination_subreddit, method)(**kwargs)
+
+        if not new_post:
+            return None
+
+        # Flair and comment don't depend on each other, send them together
+        await asyncio.gather(
+            self.apply_flair(new_post, post["link_flair_text"]),
+            self.leave_comment(new_post, build_comment(post, prepared))
+        )
+        return new_post
+
+    async def apply_flair(self, new_post, source_flair_text):
+        if not source_flair_text:
+            return
+        matching_flair = await self.flair_cache.template_id_for_async(source_flair_text)
+        if matching_flair:
+            await self.rate_limiter.wait_async()
+            with timed("flair"):
+                await new_post.flair.select(matching_flair)
+            logging.info(f"Applied flair: {source_flair_text} to post {new_post.id}")
+        else:
+            logging.info(f"No matching flair found for: {source_flair_text}")
+
+    async def leave_comment(self, new_post, comment_body):
+        # Split comment if greater than 10,000 characters - Reddit limit, chunks stay in order
+        for chunk in split_text(comment_body):
+            await self.rate_limiter.wait_async()
+            with timed("reply"):
+                await new_post.reply(chunk)
+
+    async def archive_post(self, post, task):
+        with traced(post):
+            prepared = None
+            status = "failed"
+            try:
+                prepared = await task
+                if self.state_store.is_processed(post["id"]):
+                    # Archived since it was listed (overlapping cron run, or listed twice)
+                    print(f"Skipped post {post['id']}, already archived: {post['title']}")
+                    status = "skipped"
+                elif prepared["duplicate_of"] and DUPLICATE_ACTION == "skip":
+                    record_duplicate(self.state_store, post, prepared)
+                    print(f"Skipped duplicate post {post['id']}: {post['title']}")
+                    status = "duplicate"
+                else:
+                    new_post = await self.submit_post(post, prepared)
+                    if new_post:
+                        record_archive(self.state_store, self.duplicate_index, post, prepared, new_post)
+                        print(f"Copied post {post['id']}: {post['title']}")
+                        status = "archived"
+            except (RequestException, ResponseException, RedditAPIException) as ex:
+                logging.error(f"Error for post {post['id']}: {str(ex)}")
+            except Exception as e:
+                logging.error(f"General error for post {post['id']}: {str(e)}")
+            if prepared:
+                prepared["job"].cleanup()
+            finish_trace(post, status)
@@ -13,3 +13,39 @@ destination_client_secret=""
 destination_password=""
 destination_username=""
 destination_user_agent="<Ubuntu>.python:Archive.bot:v2.0.0 (by @saltysomadmin)"
+
+
+# Optional: folder for the state database, logs, caches and temp media (default /home/ubuntu/Reddit-UFOs_Archive)
+# archive_dir = "/home/ubuntu/Reddit-UFOs_Archive"
+
+# Optional: HTTP tuning for media downloads (defaults shown)
+# http_pool_size = 16
+# http_connect_timeout = 5
+# http_read_timeout = 60
+# http_max_retries = 3
+# http_backoff_factor = 0.5
+
+# Optional: max ffmpeg merges running at once (default 2)
+# ffmpeg_workers = 2
+
+# Optional: size limit for the downloaded media cache in bytes (default 2 GB)
+# media_cache_max_bytes = 2 * 1024 ** 3
+
+# Optional: what to do with near-duplicate media, "link" to the earlier archive post, "skip" or "off" (default "link")
+# duplicate_action = "link"
+# Optional: max differing bits out of 64 for two images/keyframes to count as the same (default 7)
+# duplicate_max_distance = 7
+
+# Optional: rule table DailyRemovedFlair.py uses to decide a post was removed (default removal_rules.json in this folder)
+# removal_rules_file = "/home/ubuntu/Reddit-UFOs_Archive/removal_rules.json"
+
+# Optional: log levels for the JSON logs (default "INFO") and error_log.txt (default "ERROR").
+# The ARCHIVE_LOG_LEVEL / ARCHIVE_ERROR_LOG_LEVEL environment variables take precedence
+# log_level = "INFO"
+# error_log_level = "ERROR"
+
+# Optional: where the Prometheus .prom files go, usually node-exporter's --collector.textfile.directory
+# (default a metrics folder next to the scripts)
+# metrics_textfile_dir = "/var/lib/node_exporter/textfile_collector"
+# Optional: daemon mode also serves http://127.0.0.1:<port>/metrics (default off, same as --metrics-port)
+# metrics_port = 9105
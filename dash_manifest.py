@@ -0,0 +1,128 @@
+import re
+import logging
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from urllib.parse import urljoin
+import http_client  # Shared pooled HTTP session
+
+# One playable stream listed in a DASHPlaylist.mpd
+Representation = namedtuple("Representation", ["kind", "url", "bandwidth", "width", "height", "mime_type"])
+
+# A parsed manifest: every Representation plus the presentation duration in seconds (None if not listed)
+Manifest = namedtuple("Manifest", ["representations", "duration"])
+
+EMPTY_MANIFEST = Manifest([], None)
+
+
+def _local(tag):
+    # Strip the XML namespace, e.g. '{urn:mpeg:dash:schema:mpd:2011}Representation' -> 'Representation'
+    return tag.rsplit('}', 1)[-1]
+
+
+def _child(element, name):
+    for child in element:
+        if _local(child.tag) == name:
+            return child
+    return None
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def parse_duration(value):
+    """ISO 8601 duration as used by MPD files, e.g. 'PT1M34.5S' -> 94.5"""
+    match = re.match(r'^P(?:(\d+(?:\.\d+)?)D)?(?:T(?:(\d+(?:\.\d+)?)H)?(?:(\d+(?:\.\d+)?)M)?(?:(\d+(?:\.\d+)?)S)?)?$', value or "")
+    if not match or not any(match.groups()):
+        return None
+    days, hours, minutes, seconds = (float(group or 0) for group in match.groups())
+    return days * 86400 + hours * 3600 + minutes * 60 + seconds
+
+
+def _kind(adaptation_set, representation):
+    content_type = adaptation_set.get("contentType") or ""
+    mime_type = representation.get("mimeType") or adaptation_set.get("mimeType") or ""
+    for value in (content_type, mime_type):
+        if value.startswith("video"):
+            return "video"
+        if value.startswith("audio"):
+            return "audio"
+    # Reddit audio renditions have no height and are named *AUDIO*
+    base = _child(representation, "BaseURL")
+    if base is not None and "AUDIO" in (base.text or "").upper():
+        return "audio"
+    return "video" if representation.get("height") else None
+
+
+def parse_manifest(xml_text, manifest_url):
+    """
+    Parse an MPD document into a Manifest of every video and audio Representation,
+    with BaseURLs resolved against the manifest URL.
+    """
+    root = ET.fromstring(xml_text)
+    duration = parse_duration(root.get("mediaPresentationDuration"))
+    representations = []
+    for adaptation_set in root.iter():
+        if _local(adaptation_set.tag) != "AdaptationSet":
+            continue
+        for rep in adaptation_set:
+            if _local(rep.tag) != "Representation":
+                continue
+            base = _child(rep, "BaseURL")
+            if base is None or not (base.text or "").strip():
+                continue
+            kind = _kind(adaptation_set, rep)
+            if not kind:
+                continue
+            representations.append(Representation(
+                kind=kind,
+                url=urljoin(manifest_url, base.text.strip()),
+                bandwidth=_int(rep.get("bandwidth")),
+                width=_int(rep.get("width")),
+                height=_int(rep.get("height")),
+                mime_type=rep.get("mimeType") or adaptation_set.get("mimeType")
+            ))
+    return Manifest(representations, duration)
+
+
+def fetch_manifest(dash_url):
+    """Download and parse dash_url. Returns EMPTY_MANIFEST if it can't be read."""
+    if not dash_url:
+        return EMPTY_MANIFEST
+    try:
+        response = http_client.get(dash_url)
+        if response.status_code != 200:
+            logging.warning(f"Failed to fetch DASH manifest {dash_url}. Status code: {response.status_code}")
+            return EMPTY_MANIFEST
+        return parse_manifest(response.content, dash_url)
+    except Exception as e:
+        logging.warning(f"Failed to parse DASH manifest {dash_url}: {str(e)}")
+        return EMPTY_MANIFEST
+
+
+def videos_best_first(representations):
+    return sorted((r for r in representations if r.kind == "video"), key=lambda r: (r.height, r.bandwidth), reverse=True)
+
+
+def pick_best(representations, max_height=None):
+    """
+    Pick the highest quality video (by height, then bandwidth) and audio (by bandwidth).
+    Either side is None when the manifest doesn't list one.
+    """
+    videos = [r for r in representations if r.kind == "video" and (not max_height or r.height <= max_height)]
+    audios = [r for r in representations if r.kind == "audio"]
+    video = max(videos, key=lambda r: (r.height, r.bandwidth), default=None)
+    audio = max(audios, key=lambda r: r.bandwidth, default=None)
+    return video, audio
+
+
+def best_stream_urls(dash_url):
+    """
+    Fetch the manifest once and return (video_url, audio_url).
+    Returns (None, None) if the manifest is missing or unreadable.
+    """
+    video, audio = pick_best(fetch_manifest(dash_url).representations)
+    return (video.url if video else None), (audio.url if audio else None)
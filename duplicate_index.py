@@ -0,0 +1,162 @@
+import math
+import logging
+import threading
+import subprocess
+from collections import defaultdict
+from media_jobs import run_ffmpeg
+try:
+    from PIL import Image  # Optional, faster image decoding than spawning ffmpeg
+except ImportError:
+    Image = None
+import settings  # Optional config.py values
+
+# What the copier does with a near-duplicate: "link" to the earlier archive post, "skip" it, or "off"
+DUPLICATE_ACTION = settings.get("duplicate_action", "link")
+# Max differing bits (out of 64) for two frames to count as the same picture. Lookups only
+# guarantee finding matches up to 7 bits apart (see BANDS), so values above that miss some
+MAX_DISTANCE = settings.get("duplicate_max_distance", 7)
+
+# Share of the new post's hashes that must match one earlier post
+MIN_MATCH_RATIO = {"image": 1.0, "video": 0.6}
+
+HASH_SIZE = 8  # 8x8 low frequencies -> 64-bit hash
+SAMPLE_SIZE = 32  # Pixels per side fed into the DCT
+MAX_KEYFRAMES = 16
+FFMPEG_TIMEOUT = 120
+
+# Candidates are found through 8-bit bands: two hashes within 7 bits share at least one band exactly
+BANDS = 8
+
+_DCT = [[math.cos(math.pi * (2 * x + 1) * u / (2 * SAMPLE_SIZE)) for x in range(SAMPLE_SIZE)] for u in range(HASH_SIZE)]
+
+
+def phash(pixels):
+    """pHash of a SAMPLE_SIZE x SAMPLE_SIZE grayscale image given as a flat sequence of 0-255 values."""
+    rows = [pixels[y * SAMPLE_SIZE:(y + 1) * SAMPLE_SIZE] for y in range(SAMPLE_SIZE)]
+    # Separable 2D DCT, only the low frequencies are needed
+    partial = [[sum(p * c for p, c in zip(row, basis)) for basis in _DCT] for row in rows]
+    low = [
+        sum(_DCT[v][y] * partial[y][u] for y in range(SAMPLE_SIZE))
+        for v in range(HASH_SIZE) for u in range(HASH_SIZE)
+    ]
+    median = sorted(low)[len(low) // 2]
+    value = 0
+    for coefficient in low:
+        value = (value << 1) | (coefficient > median)
+    return value
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def _frames(raw):
+    frame_bytes = SAMPLE_SIZE * SAMPLE_SIZE
+    return [raw[i:i + frame_bytes] for i in range(0, len(raw) - frame_bytes + 1, frame_bytes)]
+
+
+def image_hashes(path):
+    """[pHash] of an image file, [] if it can't be decoded."""
+    try:
+        if Image is not None:
+            with Image.open(path) as image:
+                small = image.convert("L").resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.LANCZOS)
+                return [phash(list(small.getdata()))]
+        raw = run_ffmpeg([
+            "-i", path,
+            "-vf", f"scale={SAMPLE_SIZE}:{SAMPLE_SIZE},format=gray",
+            "-frames:v", "1",
+            "-f", "rawvideo", "-"
+        ], capture_output=True, timeout=FFMPEG_TIMEOUT)
+        return [phash(frame) for frame in _frames(raw)]
+    except (OSError, subprocess.SubprocessError) as e:
+        logging.warning(f"Could not hash image {path}: {str(e)}")
+    except Exception as e:
+        logging.warning(f"Could not decode image {path}: {str(e)}")
+    return []
+
+
+def video_hashes(source):
+    """
+    pHashes of up to MAX_KEYFRAMES keyframes. source can be a file or a URL; only keyframes
+    are decoded, so hashing the smallest rendition straight from the CDN is cheap.
+    """
+    try:
+        raw = run_ffmpeg([
+            "-skip_frame", "nokey",
+            "-i", source,
+            "-an",
+            "-vf", f"scale={SAMPLE_SIZE}:{SAMPLE_SIZE},format=gray",
+            "-vsync", "vfr",
+            "-frames:v", str(MAX_KEYFRAMES),
+            "-f", "rawvideo", "-"
+        ], capture_output=True, timeout=FFMPEG_TIMEOUT)
+        return [phash(frame) for frame in _frames(raw)]
+    except (OSError, subprocess.SubprocessError) as e:
+        logging.warning(f"Could not hash video {source}: {str(e)}")
+    return []
+
+
+def _bands(value):
+    return [(band, (value >> (band * 8)) & 0xFF) for band in range(BANDS)]
+
+
+class DuplicateIndex:
+    """
+    In-memory lookup over the perceptual hashes kept in the state store. Loaded once per run,
+    new posts are added to both. Lookups only compare against hashes sharing a band.
+    """
+    def __init__(self, state_store, max_distance=MAX_DISTANCE):
+        self.state_store = state_store
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._hashes = []  # (source_id, kind, hash)
+        self._buckets = defaultdict(list)  # (kind, band, band value) -> positions in _hashes
+        for source_id, kind, value in state_store.iter_media_hashes():
+            self._index(source_id, kind, value)
+
+    def _index(self, source_id, kind, value):
+        position = len(self._hashes)
+        self._hashes.append((source_id, kind, value))
+        for band in _bands(value):
+            self._buckets[(kind,) + band].append(position)
+
+    def add(self, source_id, kind, hashes):
+        if not hashes:
+            return
+        self.state_store.add_media_hashes(source_id, kind, hashes)
+        with self._lock:
+            for value in hashes:
+                self._index(source_id, kind, value)
+
+    def find(self, kind, hashes, exclude=None):
+        """Source ID of an earlier post whose media matches these hashes, or None."""
+        if not hashes:
+            return None
+        matched = defaultdict(int)  # source_id -> query hashes it matched
+        with self._lock:
+            for value in hashes:
+                candidates = set()
+                for band in _bands(value):
+                    candidates.update(self._buckets.get((kind,) + band, ()))
+                hits = {
+                    self._hashes[position][0] for position in candidates
+                    if hamming(value, self._hashes[position][2]) <= self.max_distance
+                }
+                for source_id in hits:
+                    matched[source_id] += 1
+        matched.pop(exclude, None)
+        if not matched:
+            return None
+        source_id, count = max(matched.items(), key=lambda item: item[1])
+        if count / len(hashes) >= MIN_MATCH_RATIO[kind]:
+            return source_id
+        return None
+
+    def find_archived(self, kind, hashes, exclude=None):
+        """State row of the matching earlier post if it has an archive copy to point at, else None."""
+        source_id = self.find(kind, hashes, exclude=exclude)
+        earlier = self.state_store.get_post(source_id) if source_id else None
+        if earlier and earlier["archive_id"]:
+            return earlier
+        return None
@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import hashlib
+import logging
+
+# How long cached flair templates are trusted before checking the subreddit again
+FLAIR_CACHE_TTL = 6 * 60 * 60
+
+# Least time between refreshes triggered by an unknown flair text, so a long-running
+# daemon still picks up new templates without refetching on every unmatched post
+MISS_REFRESH_INTERVAL = 15 * 60
+
+
+class FlairTemplateCache:
+    """
+    Link flair templates for a subreddit, loaded once per run and kept on disk between runs.
+
+    Lookups are dict hits keyed by flair text or template ID. The disk copy is refreshed
+    when it's older than the TTL; a refresh that returns the same templates (same content
+    hash, used like an ETag) just renews the timestamp. An unknown flair text triggers
+    a refresh in case a template was added since the last fetch, at most once per
+    MISS_REFRESH_INTERVAL (so once per cron run).
+    """
+    def __init__(self, subreddit, cache_file, ttl=FLAIR_CACHE_TTL):
+        self.subreddit = subreddit
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.by_text = {}
+        self.by_id = {}
+        self.etag = None
+        self.fetched_at = 0
+        self._last_refresh = 0
+        self._loaded = False
+
+    def _index(self, templates):
+        self.by_text = {}
+        self.by_id = {}
+        for template in templates:
+            # First template wins for duplicate texts, same as the old linear scan
+            self.by_text.setdefault(template['text'], template['id'])
+            self.by_id[template['id']] = template['text']
+
+    def _read_disk(self):
+        if not os.path.exists(self.cache_file):
+            return None
+        try:
+            with open(self.cache_file, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable flair cache {self.cache_file}: {str(e)}")
+            return None
+
+    def _write_disk(self, templates):
+        temp_path = self.cache_file + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"fetched_at": self.fetched_at, "etag": self.etag, "templates": templates}, f)
+        os.replace(temp_path, self.cache_file)
+
+    def refresh(self):
+        """Fetch templates from Reddit and update memory and disk."""
+        self._store([{"id": flair['id'], "text": flair['text']} for flair in self.subreddit.flair.link_templates])
+
+    async def refresh_async(self):
+        """refresh() for an asyncpraw subreddit."""
+        self._store([{"id": flair['id'], "text": flair['text']} async for flair in self.subreddit.flair.link_templates])
+
+    def _store(self, templates):
+        etag = hashlib.sha256(json.dumps(templates, sort_keys=True).encode()).hexdigest()
+        if etag != self.etag:
+            logging.info(f"Flair templates changed, {len(templates)} templates cached.")
+        self.etag = etag
+        self.fetched_at = time.time()
+        self._last_refresh = time.time()
+        self._index(templates)
+        try:
+            self._write_disk(templates)
+        except Exception as e:
+            logging.error(f"Failed to write flair cache {self.cache_file}: {str(e)}")
+
+    def _load_disk(self):
+        """Load the disk copy once per run. Returns True if it's missing or stale."""
+        if self._loaded:
+            return False
+        self._loaded = True
+        cached = self._read_disk()
+        if cached:
+            self.etag = cached.get("etag")
+            self.fetched_at = cached.get("fetched_at", 0)
+            self._index(cached.get("templates", []))
+        return not cached or self._stale()
+
+    def _stale(self):
+        return time.time() - self.fetched_at > self.ttl
+
+    def _may_refresh_on_miss(self):
+        return time.time() - self._last_refresh > MISS_REFRESH_INTERVAL
+
+    def load(self):
+        # Also re-checks the TTL, for processes that outlive it
+        if self._load_disk() or self._stale():
+            self.refresh()
+
+    async def load_async(self):
+        if self._load_disk() or self._stale():
+            await self.refresh_async()
+
+    def template_id_for(self, flair_text):
+        """Template ID for a flair text, or None if the subreddit has no such flair."""
+        if not flair_text:
+            return None
+        self.load()
+        template_id = self.by_text.get(flair_text)
+        if template_id is None and self._may_refresh_on_miss():
+            self.refresh()
+            template_id = self.by_text.get(flair_text)
+        return template_id
+
+    async def template_id_for_async(self, flair_text):
+        """template_id_for() for an asyncpraw subreddit."""
+        if not flair_text:
+            return None
+        await self.load_async()
+        template_id = self.by_text.get(flair_text)
+        if template_id is None and self._may_refresh_on_miss():
+            await self.refresh_async()
+            template_id = self.by_text.get(flair_text)
+        return template_id
+
+    def text_for(self, template_id):
+        self.load()
+        return self.by_id.get(template_id)
@@ -0,0 +1,179 @@
+"""
+Forward new lines of a log file to a Discord webhook.
+
+Lines are packed into as few 2000-character messages as possible, Discord's rate limit
+headers are respected, and progress is kept as a byte offset next to the log
+(<log>.offset) instead of deleting the file. A rotated or truncated log starts over
+from the top. Only uses the standard library so it runs under any python3.
+
+    WEBHOOK_URL=https://discord.com/api/webhooks/... python3 forward_log.py cron_log.txt
+"""
+import os
+import re
+import sys
+import json
+import time
+import fcntl
+import argparse
+import urllib.request
+import urllib.error
+
+# Discord's message length limit
+MAX_MESSAGE_LENGTH = 2000
+
+# Attempts per message when Discord answers 429 or the request fails
+MAX_ATTEMPTS = 5
+
+REQUEST_TIMEOUT = 30
+
+
+def read_checkpoint(offset_file, log_stat):
+    """Byte offset already forwarded, 0 if the log was rotated or truncated since."""
+    try:
+        with open(offset_file, "r") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    if checkpoint.get("inode") != log_stat.st_ino or checkpoint.get("offset", 0) > log_stat.st_size:
+        return 0
+    return checkpoint.get("offset", 0)
+
+
+def write_checkpoint(offset_file, log_stat, offset):
+    temp_path = offset_file + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump({"inode": log_stat.st_ino, "offset": offset}, f)
+    os.replace(temp_path, offset_file)
+
+
+def read_new_lines(log_file, offset):
+    """Complete lines after offset as [(line, end offset)]. A half-written last line waits for the next run."""
+    with open(log_file, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    lines = []
+    position = offset
+    for raw in data.splitlines(keepends=True):
+        if not raw.endswith(b"\n"):
+            break
+        position += len(raw)
+        line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+        if line.strip():
+            lines.append((line, position))
+        elif lines:
+            lines[-1] = (lines[-1][0], position)
+    return lines, position
+
+
+def pack_messages(lines):
+    """Group lines into messages of at most MAX_MESSAGE_LENGTH as [(text, end offset)]."""
+    messages = []
+    current = []
+    length = 0
+    end = None
+    for line, line_end in lines:
+        # A single line longer than a message is split across several
+        pieces = [line[i:i + MAX_MESSAGE_LENGTH] for i in range(0, len(line), MAX_MESSAGE_LENGTH)]
+        for piece in pieces:
+            added = len(piece) + (1 if current else 0)
+            if current and length + added > MAX_MESSAGE_LENGTH:
+                messages.append(("\n".join(current), end))
+                current, length = [], 0
+                added = len(piece)
+            current.append(piece)
+            length += added
+            end = line_end
+    if current:
+        messages.append(("\n".join(current), end))
+    return messages
+
+
+def post_message(webhook_url, content):
+    """POST one message, waiting out Discord's rate limits. Returns True once it's delivered."""
+    # Log lines may contain @everyone or role mentions, never ping anyone
+    payload = json.dumps({"content": content, "allowed_mentions": {"parse": []}}).encode()
+    for attempt in range(MAX_ATTEMPTS):
+        request = urllib.request.Request(
+            webhook_url,
+            data=payload,
+            headers={"Content-Type": "application/json", "User-Agent": "Reddit-UFOs_Archive log forwarder"},
+            method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+                # Bucket empty: wait for it to refill before the next message
+                if response.headers.get("X-RateLimit-Remaining") == "0":
+                    time.sleep(float(response.headers.get("X-RateLimit-Reset-After", 1)))
+                return True
+        except urllib.error.HTTPError as e:
+            if e.code == 429:
+                try:
+                    retry_after = float(json.loads(e.read().decode()).get("retry_after", 1))
+                except ValueError:
+                    retry_after = float(e.headers.get("Retry-After", 1))
+                print(f"Rate limited by Discord, retrying in {retry_after:.1f}s.")
+                time.sleep(retry_after)
+                continue
+            print(f"Discord rejected the message ({e.code}): {e.read().decode(errors='replace')[:200]}")
+            return False
+        except (urllib.error.URLError, OSError) as e:
+            print(f"Failed to reach Discord (attempt {attempt + 1}): {str(e)}")
+            time.sleep(2 ** attempt)
+    return False
+
+
+def forward(log_file, webhook_url, skip_if_only=None):
+    if not os.path.exists(log_file):
+        print(f"Log file does not exist: {log_file}")
+        return 0
+    offset_file = log_file + ".offset"
+    # One forwarder per log at a time, overlapping cron runs would send lines twice
+    with open(offset_file + ".lock", "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            print("Another forwarder is running for this log. Exiting.")
+            return 0
+
+        log_stat = os.stat(log_file)
+        offset = read_checkpoint(offset_file, log_stat)
+        lines, end = read_new_lines(log_file, offset)
+        if not lines:
+            if end != offset:
+                write_checkpoint(offset_file, log_stat, end)
+            print("No new log lines. Exiting.")
+            return 0
+
+        if skip_if_only and all(re.search(skip_if_only, line) for line, _ in lines):
+            print("Only unimportant lines since the last run, not forwarding them.")
+            write_checkpoint(offset_file, log_stat, end)
+            return 0
+
+        messages = pack_messages(lines)
+        for sent, (content, message_end) in enumerate(messages):
+            if not post_message(webhook_url, content):
+                print(f"Stopped after {sent} of {len(messages)} messages, the rest go next run.")
+                return 1
+            # Checkpoint after every message so a crash never resends or skips lines
+            write_checkpoint(offset_file, log_stat, message_end)
+        if end != messages[-1][1]:
+            write_checkpoint(offset_file, log_stat, end)
+        print(f"Forwarded {len(lines)} log lines in {len(messages)} messages.")
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Forward new log lines to a Discord webhook.")
+    parser.add_argument("log_file")
+    parser.add_argument("--webhook-url", default=os.environ.get("WEBHOOK_URL"),
+                        help="defaults to the WEBHOOK_URL environment variable")
+    parser.add_argument("--skip-if-only", metavar="REGEX",
+                        help="don't forward anything if every new line matches this pattern")
+    args = parser.parse_args()
+    if not args.webhook_url:
+        parser.error("no webhook URL, set WEBHOOK_URL or pass --webhook-url")
+    sys.exit(forward(args.log_file, args.webhook_url, args.skip_if_only))
+
+
+if __name__ == "__main__":
+    main()
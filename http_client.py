@@ -0,0 +1,63 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import settings  # Optional config.py values
+
+# Connection pool / timeout / retry settings. Override any of these in config.py
+POOL_SIZE = settings.get("http_pool_size", 16)
+CONNECT_TIMEOUT = settings.get("http_connect_timeout", 5)
+READ_TIMEOUT = settings.get("http_read_timeout", 60)
+MAX_RETRIES = settings.get("http_max_retries", 3)
+BACKOFF_FACTOR = settings.get("http_backoff_factor", 0.5)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0'
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def build_session(pool_size=POOL_SIZE, max_retries=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR):
+    """
+    Create a keep-alive session with pooled connections and retry/backoff on
+    transient errors (connection resets, 429 and 5xx from the CDN).
+    """
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """Return the process-wide shared session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+
+def get(url, **kwargs):
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    return get_session().get(url, **kwargs)
+
+
+def head(url, **kwargs):
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    kwargs.setdefault("allow_redirects", True)
+    return get_session().head(url, **kwargs)
@@ -0,0 +1,148 @@
+import os
+import time
+import shutil
+import sqlite3
+import hashlib
+import logging
+import threading
+from urllib.parse import urlsplit, urlunsplit
+import settings  # Optional config.py values
+
+# Total size the cache may grow to before least recently used files are evicted. Override in config.py
+MEDIA_CACHE_MAX_BYTES = settings.get("media_cache_max_bytes", 2 * 1024 ** 3)
+
+# Reddit CDN hosts whose query strings are only signing/format noise
+REDDIT_MEDIA_HOSTS = ("i.redd.it", "v.redd.it", "preview.redd.it", "external-preview.redd.it")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_blobs_last_used ON blobs (last_used);
+CREATE TABLE IF NOT EXISTS keys (
+    cache_key TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_keys_sha256 ON keys (sha256);
+"""
+
+
+def normalize_url(url):
+    """Canonical cache key for a media URL, so preview/i.redd.it and signed variants collapse together."""
+    parts = urlsplit(url)
+    host = parts.netloc.lower()
+    if host == "preview.redd.it":
+        host = "i.redd.it"
+    query = "" if host in REDDIT_MEDIA_HOSTS else parts.query
+    return urlunsplit((parts.scheme.lower(), host, parts.path, query, ""))
+
+
+def merge_key(video_url, audio_url):
+    """Cache key for an ffmpeg merge of the given video and audio tracks."""
+    return f"merge:{normalize_url(video_url)}|{normalize_url(audio_url)}"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _link_or_copy(source, dest):
+    # Hard links are free when the cache and the work directory share a filesystem
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copyfile(source, dest)
+
+
+class MediaCache:
+    """
+    Content-addressed store for downloaded media. Files are kept once per SHA-256 under
+    objects/, and any number of keys (normalized URLs, merge inputs) point at them.
+    Evicts least recently used files once the total size passes max_bytes.
+    """
+    def __init__(self, cache_dir, max_bytes=MEDIA_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, "objects")
+        self.max_bytes = max_bytes
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(cache_dir, "index.db"), timeout=30, check_same_thread=False)
+        with self._lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+
+    def _key(self, key):
+        return normalize_url(key) if key.startswith(("http://", "https://")) else key
+
+    def _object_path(self, sha256):
+        return os.path.join(self.objects_dir, sha256[:2], sha256)
+
+    def fetch(self, key, dest_path):
+        """Place the cached file for key at dest_path. Returns dest_path on a hit, None on a miss."""
+        cache_key = self._key(key)
+        with self._lock:
+            row = self.conn.execute("SELECT sha256 FROM keys WHERE cache_key = ?", (cache_key,)).fetchone()
+        if not row:
+            return None
+        object_path = self._object_path(row[0])
+        try:
+            _link_or_copy(object_path, dest_path)
+        except OSError:
+            # Evicted or removed by hand, forget the key
+            with self._lock, self.conn:
+                self.conn.execute("DELETE FROM keys WHERE cache_key = ?", (cache_key,))
+            return None
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE blobs SET last_used = ? WHERE sha256 = ?", (time.time(), row[0]))
+        logging.info(f"Media cache hit for {cache_key}")
+        return dest_path
+
+    def store(self, key, path):
+        """Add a downloaded file under key. Identical content is only kept once."""
+        try:
+            sha256 = file_sha256(path)
+            size = os.path.getsize(path)
+            object_path = self._object_path(sha256)
+            if not os.path.exists(object_path):
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                temp_path = f"{object_path}.{threading.get_ident()}.tmp"
+                _link_or_copy(path, temp_path)
+                os.replace(temp_path, object_path)
+            with self._lock, self.conn:
+                self.conn.execute(
+                    "INSERT INTO blobs (sha256, size, last_used) VALUES (?, ?, ?) "
+                    "ON CONFLICT(sha256) DO UPDATE SET last_used = excluded.last_used",
+                    (sha256, size, time.time())
+                )
+                self.conn.execute(
+                    "INSERT INTO keys (cache_key, sha256) VALUES (?, ?) "
+                    "ON CONFLICT(cache_key) DO UPDATE SET sha256 = excluded.sha256",
+                    (self._key(key), sha256)
+                )
+            self.evict()
+            return sha256
+        except Exception as e:
+            logging.error(f"Failed to cache {path}: {str(e)}")
+            return None
+
+    def evict(self):
+        """Drop least recently used files until the cache fits in max_bytes."""
+        with self._lock, self.conn:
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for sha256, size in self.conn.execute("SELECT sha256, size FROM blobs ORDER BY last_used").fetchall():
+                if total <= self.max_bytes:
+                    break
+                object_path = self._object_path(sha256)
+                if os.path.exists(object_path):
+                    os.remove(object_path)
+                self.conn.execute("DELETE FROM keys WHERE sha256 = ?", (sha256,))
+                self.conn.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+                total -= size
@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import fcntl
+import shutil
+import hashlib
+import logging
+import http_client  # Shared pooled HTTP session
+
+# Copy buffer bounds. Small files use the minimum, big videos scale up to the maximum
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Resumable downloads: attempts per call, how often progress is journaled, how long partials are kept
+RESUME_ATTEMPTS = 3
+JOURNAL_EVERY_BYTES = 8 * 1024 * 1024
+PARTIAL_MAX_AGE = 24 * 60 * 60
+
+# Statuses that won't get better by retrying
+FATAL_STATUSES = (401, 403, 404, 410)
+
+
+def chunk_size_for(content_length):
+    """Aim for roughly 64 copy calls per file, clamped to sane buffer sizes."""
+    if not content_length:
+        return MIN_CHUNK_SIZE
+    return max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, content_length // 64))
+
+
+def preallocate(out_file, size):
+    # Reserve the space up front so a full disk fails fast and the file isn't fragmented
+    try:
+        os.posix_fallocate(out_file.fileno(), 0, size)
+    except (AttributeError, OSError):
+        pass
+
+
+def download_file(url, full_path, headers=None, partial_dir=None):
+    """
+    Stream url to full_path in large chunks and verify the byte count against Content-Length.
+    With partial_dir set the transfer is resumable: progress is journaled there and a dropped
+    connection is picked up with a Range request, on the next attempt or the next run.
+    Returns full_path, or None on failure.
+    """
+    if partial_dir:
+        return _download_resumable(url, full_path, headers, partial_dir)
+    return _download_once(url, full_path, headers)
+
+
+def _download_once(url, full_path, headers):
+    response = http_client.get(url, stream=True, headers=headers)
+    with response:
+        if response.status_code != 200:
+            logging.error(f"Failed to download media from {url}. Status code: {response.status_code}.")
+            return None
+
+        # Content-Length is the compressed size if the server gzipped it, so only trust it for identity encoding
+        encoded = response.headers.get("Content-Encoding", "identity") != "identity"
+        expected = None if encoded else int(response.headers.get("Content-Length") or 0) or None
+        response.raw.decode_content = True
+
+        try:
+            with open(full_path, 'wb') as out_file:
+                if expected:
+                    preallocate(out_file, expected)
+                shutil.copyfileobj(response.raw, out_file, chunk_size_for(expected))
+                written = out_file.tell()
+                # Drop any preallocated tail if the stream came up short
+                out_file.truncate(written)
+        except Exception as e:
+            logging.error(f"Download of {url} failed: {str(e)}")
+            if os.path.exists(full_path):
+                os.remove(full_path)
+            return None
+
+    if expected is not None and written != expected:
+        logging.error(f"Incomplete download from {url}: got {written} of {expected} bytes.")
+        os.remove(full_path)
+        return None
+    return full_path
+
+
+def _partial_paths(partial_dir, url):
+    key = hashlib.sha256(url.encode()).hexdigest()[:32]
+    base = os.path.join(partial_dir, key)
+    return base + ".part", base + ".json", base + ".lock"
+
+
+def _read_journal(journal_path, part_path, url):
+    try:
+        with open(journal_path, "r") as f:
+            journal = json.load(f)
+        if journal.get("url") == url and os.path.exists(part_path):
+            return journal
+    except (OSError, ValueError):
+        pass
+    return {"url": url, "size": None, "validator": None, "written": 0}
+
+
+def _write_journal(journal_path, journal):
+    temp_path = journal_path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(journal, f)
+    os.replace(temp_path, journal_path)
+
+
+def _discard_partial(part_path, journal_path):
+    for path in (part_path, journal_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _download_resumable(url, full_path, headers, partial_dir):
+    os.makedirs(partial_dir, exist_ok=True)
+    part_path, journal_path, lock_path = _partial_paths(partial_dir, url)
+    # Crossposts prepared in parallel and overlapping cron runs can fetch the same URL at once.
+    # They'd share the partial, so the second waits and then finds it gone or finished
+    with open(lock_path, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return _resume(url, full_path, headers, part_path, journal_path)
+
+
+def _resume(url, full_path, headers, part_path, journal_path):
+    for attempt in range(RESUME_ATTEMPTS):
+        journal = _read_journal(journal_path, part_path, url)
+        offset = journal["written"]
+        # Byte offsets only mean something on the unencoded body
+        request_headers = dict(headers or {}, **{"Accept-Encoding": "identity"})
+        if offset:
+            request_headers["Range"] = f"bytes={offset}-"
+            if journal["validator"]:
+                # Server sends the whole file instead if it changed since the partial was written
+                request_headers["If-Range"] = journal["validator"]
+
+        try:
+            response = http_client.get(url, stream=True, headers=request_headers)
+        except Exception as e:
+            logging.warning(f"Download of {url} failed (attempt {attempt + 1}): {str(e)}")
+            continue
+
+        with response:
+            if response.status_code == 416 and journal["size"] == offset:
+                pass  # Partial already holds the whole file
+            elif response.status_code == 416:
+                _discard_partial(part_path, journal_path)
+                continue
+            elif response.status_code in (200, 206):
+                if response.status_code == 200:
+                    # No range support or the file changed, start over
+                    offset = 0
+                    size = int(response.headers.get("Content-Length") or 0) or None
+                else:
+                    content_range = response.headers.get("Content-Range", "")
+                    total = content_range.rsplit("/", 1)[-1]
+                    size = int(total) if total.isdigit() else journal["size"]
+                etag = response.headers.get("ETag")
+                journal = {
+                    "url": url,
+                    "size": size,
+                    "validator": etag if etag and not etag.startswith("W/") else response.headers.get("Last-Modified"),
+                    "written": offset
+                }
+                _write_journal(journal_path, journal)
+                try:
+                    _copy_from(response, part_path, journal, journal_path)
+                except Exception as e:
+                    logging.warning(f"Download of {url} dropped at {journal['written']} bytes (attempt {attempt + 1}): {str(e)}")
+                    continue
+            elif response.status_code in FATAL_STATUSES:
+                logging.error(f"Failed to download media from {url}. Status code: {response.status_code}.")
+                _discard_partial(part_path, journal_path)
+                return None
+            else:
+                logging.warning(f"Download of {url} returned {response.status_code} (attempt {attempt + 1})")
+                continue
+
+        if journal["size"] is not None and journal["written"] != journal["size"]:
+            logging.warning(f"Incomplete download from {url}: {journal['written']} of {journal['size']} bytes (attempt {attempt + 1})")
+            continue
+
+        with open(part_path, "r+b") as f:
+            f.truncate(journal["written"])
+        os.replace(part_path, full_path)
+        os.remove(journal_path)
+        return full_path
+
+    logging.error(f"Failed to download media from {url} after {RESUME_ATTEMPTS} attempts, partial kept for the next run.")
+    return None
+
+
+def _copy_from(response, part_path, journal, journal_path):
+    offset = journal["written"]
+    with open(part_path, "r+b" if offset and os.path.exists(part_path) else "wb") as out_file:
+        if journal["size"]:
+            preallocate(out_file, journal["size"])
+        out_file.seek(offset)
+        chunk_size = chunk_size_for(journal["size"])
+        since_journal = 0
+        try:
+            while True:
+                data = response.raw.read(chunk_size)
+                if not data:
+                    break
+                out_file.write(data)
+                since_journal += len(data)
+                if since_journal >= JOURNAL_EVERY_BYTES:
+                    # Journal lags the file slightly, resuming from a lower offset just rewrites those bytes
+                    out_file.flush()
+                    journal["written"] = out_file.tell()
+                    _write_journal(journal_path, journal)
+                    since_journal = 0
+        finally:
+            out_file.flush()
+            journal["written"] = out_file.tell()
+            _write_journal(journal_path, journal)
+
+
+def cleanup_stale_partials(partial_dir, max_age=PARTIAL_MAX_AGE):
+    """Give up on partial downloads nobody has resumed for a day."""
+    if not os.path.isdir(partial_dir):
+        return
+    cutoff = time.time() - max_age
+    for entry in os.scandir(partial_dir):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError as e:
+            logging.warning(f"Could not remove stale partial {entry.path}: {str(e)}")
@@ -0,0 +1,82 @@
+import os
+import time
+import shutil
+import logging
+import tempfile
+import threading
+import subprocess
+import metrics
+import settings  # Optional config.py values
+
+# Max ffmpeg processes running at once across all media jobs. Override in config.py
+FFMPEG_WORKERS = settings.get("ffmpeg_workers", 2)
+
+# Work directories older than this are leftovers from a crashed run
+STALE_WORK_DIR_SECONDS = 2 * 60 * 60
+
+_ffmpeg_slots = threading.BoundedSemaphore(FFMPEG_WORKERS)
+
+
+class MediaJob:
+    """
+    Private work directory for one submission's media. Every file the job writes lives
+    inside it, so posts prepared in parallel (or by overlapping cron runs) never share paths,
+    and cleanup is a single rmtree.
+    """
+    def __init__(self, base_dir, name):
+        os.makedirs(base_dir, exist_ok=True)
+        self.dir = tempfile.mkdtemp(prefix=f"{name}_", dir=base_dir)
+
+    def path(self, file_name):
+        return os.path.join(self.dir, file_name)
+
+    def cleanup(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+def merge_audio_video(video_url, audio_url, output_path):
+    """
+    Mux video and audio straight from their URLs with stream copy, no re-encode and no
+    intermediate files. Blocks while FFMPEG_WORKERS merges are already running.
+    Raises subprocess.CalledProcessError if ffmpeg fails.
+    """
+    run_ffmpeg([
+        "-y",
+        "-i", video_url,
+        "-i", audio_url,
+        "-c", "copy",
+        output_path
+    ])
+    return output_path
+
+
+def run_ffmpeg(args, capture_output=False, timeout=None):
+    """
+    Run ffmpeg with args once a slot is free. Returns stdout bytes when capture_output is set.
+    Raises subprocess.CalledProcessError if ffmpeg fails (FileNotFoundError if it isn't installed).
+    """
+    cmd = ["ffmpeg", "-loglevel", "error"] + args
+    stdout = subprocess.PIPE if capture_output else subprocess.DEVNULL
+    with _ffmpeg_slots:
+        try:
+            result = subprocess.run(cmd, check=True, stdout=stdout, stderr=subprocess.DEVNULL, timeout=timeout)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+            metrics.FFMPEG_FAILURES.inc()
+            raise
+    return result.stdout
+
+
+def cleanup_stale_jobs(base_dir, max_age=STALE_WORK_DIR_SECONDS):
+    """Remove work directories left behind by runs that died before cleaning up."""
+    if not os.path.isdir(base_dir):
+        return
+    cutoff = time.time() - max_age
+    for entry in os.scandir(base_dir):
+        if entry.name.startswith("."):
+            continue  # e.g. .partial, the resumable download journal
+        try:
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                logging.info(f"Removed stale media work directory {entry.path}")
+        except OSError as e:
+            logging.warning(f"Could not clean up {entry.path}: {str(e)}")
@@ -0,0 +1,61 @@
+import threading
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+# Overall number of downloads in flight at once
+MAX_WORKERS = 8
+
+# Max simultaneous downloads against a single host (i.redd.it, v.redd.it, ...)
+MAX_PER_HOST = 4
+
+
+class HostLimiter:
+    """
+    Hands out one semaphore per host so a single CDN never sees more than
+    max_per_host connections from us at the same time.
+    """
+    def __init__(self, max_per_host=MAX_PER_HOST):
+        self.max_per_host = max_per_host
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def get(self, url):
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._semaphores[host]
+
+
+# Shared by every download_all() call, so the cap holds per host across posts prepared in parallel
+host_limiter = HostLimiter()
+
+
+def download_all(jobs, download_fn, max_workers=MAX_WORKERS, limiter=host_limiter):
+    """
+    Download every (url, file_name) job concurrently using download_fn(url, file_name).
+    Results come back in the same order as jobs; failed downloads are None.
+    """
+    if not jobs:
+        return []
+
+    def run(context, job):
+        # Runs in the caller's logging context so errors keep the post's trace ID
+        return context.run(fetch, job)
+
+    def fetch(job):
+        url, file_name = job
+        with limiter.get(url):
+            try:
+                return download_fn(url, file_name)
+            except Exception as e:
+                logging.error(f"Download failed for {url}: {str(e)}")
+                return None
+
+    workers = max(1, min(max_workers, len(jobs)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # map() yields in submission order, which keeps the gallery order intact.
+        # One context copy per job, a context can't be entered by two threads at once
+        return list(pool.map(run, [contextvars.copy_context() for _ in jobs], jobs))
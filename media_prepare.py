@@ -0,0 +1,202 @@
+import os
+import logging
+import functools
+import subprocess
+import metrics
+import dash_manifest  # DASHPlaylist.mpd parser
+import media_probe  # Pre-flight size/duration checks
+from media_pool import download_all
+from media_download import download_file
+from media_jobs import MediaJob, merge_audio_video
+from media_cache import merge_key
+from duplicate_index import DUPLICATE_ACTION, image_hashes, video_hashes
+from archive_post import duplicate_note, get_audio_url_from_fallback
+from structured_log import traced, timed
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0'
+}
+
+
+def is_image(path):
+    return path.lower().endswith(('jpg', 'jpeg', 'png', 'gif', 'webp'))
+
+
+def video_hash_source(manifest, video_url):
+    """
+    What a video is fingerprinted from: keyframes of the smallest rendition are enough to spot a
+    repost before downloading it. Every script that indexes videos hashes this, so hashes match.
+    """
+    renditions = dash_manifest.videos_best_first(manifest.representations) if manifest else []
+    return renditions[-1].url if renditions else video_url
+
+
+class MediaPreparer:
+    """
+    Download/transcode stage shared by the sync and async copiers: resolves the post's media,
+    decides whether Reddit will take it, checks for duplicates and fetches it through the media
+    cache and the resumable downloader. Blocking, the async copier runs it in threads.
+    Only works on the plain snapshot dict, never on PRAW objects.
+    """
+    def __init__(self, media_cache, duplicate_index, media_dir, partial_dir):
+        self.media_cache = media_cache
+        self.duplicate_index = duplicate_index
+        self.media_dir = media_dir
+        self.partial_dir = partial_dir
+
+    def download_media(self, url, file_name, dest_dir):
+        if "preview.redd.it" in url:
+            url = url.replace("preview.redd.it", "i.redd.it")
+
+        full_path = os.path.join(dest_dir, file_name)
+        # Reposts and crossposts often point at media we already have
+        if self.media_cache.fetch(url, full_path):
+            metrics.MEDIA_BYTES.inc(os.path.getsize(full_path), source="cache")
+            return full_path
+        # Large-chunk, resumable stream copy with a Content-Length check, logs its own failures
+        if download_file(url, full_path, headers=DEFAULT_HEADERS, partial_dir=self.partial_dir):
+            metrics.MEDIA_BYTES.inc(os.path.getsize(full_path), source="download")
+            self.media_cache.store(url, full_path)
+            return full_path
+        return None
+
+    def merge_media(self, video_url, audio_url, output_path):
+        # Raises subprocess.CalledProcessError like merge_audio_video, cache hits skip ffmpeg entirely
+        key = merge_key(video_url, audio_url)
+        if self.media_cache.fetch(key, output_path):
+            metrics.MEDIA_BYTES.inc(os.path.getsize(output_path), source="cache")
+            return output_path
+        merge_audio_video(video_url, audio_url, output_path)
+        metrics.MEDIA_BYTES.inc(os.path.getsize(output_path), source="merge")
+        self.media_cache.store(key, output_path)
+        return output_path
+
+    def check_duplicate(self, post, prepared, kind, sources):
+        """
+        Perceptual-hash the post's media and look for an earlier archived post showing the same thing.
+        Sets prepared["fingerprint"] for the index and prepared["duplicate_of"] on a match.
+        """
+        if DUPLICATE_ACTION == "off" or not sources:
+            return False
+        hash_fn = image_hashes if kind == "image" else video_hashes
+        with timed("phash", kind=kind):
+            hashes = [value for source in sources for value in hash_fn(source)]
+        prepared["fingerprint"] = (kind, hashes)
+        earlier = self.duplicate_index.find_archived(kind, hashes, exclude=post["id"])
+        if not earlier:
+            return False
+        prepared["duplicate_of"] = earlier
+        prepared["upload_note"] = duplicate_note(earlier["source_id"], earlier["archive_id"])
+        logging.info(f"Post {post['id']} is a near-duplicate of {earlier['source_id']}, archived as {earlier['archive_id']}")
+        return True
+
+    def prepare_gallery(self, post, job):
+        """Resolve any gallery videos from their manifests, then fetch every item at once."""
+        gallery_jobs = []
+        for item in post["media"]["gallery_items"]:
+            img_url = item["url"]
+            if not img_url and item["dash_url"]:
+                # Best video rendition listed in the manifest
+                img_url, _ = dash_manifest.best_stream_urls(item["dash_url"])
+            if not img_url:
+                img_url = item["fallback_url"]
+            if img_url:
+                ext = os.path.splitext(img_url.split("?")[0])[-1]
+                gallery_jobs.append((img_url, f"{item['media_id']}{ext}"))
+
+        # Results keep the gallery order
+        with timed("download", count=len(gallery_jobs)):
+            return [path for path in download_all(gallery_jobs, functools.partial(self.download_media, dest_dir=job.dir)) if path]
+
+    def prepare_video(self, post, prepared, job):
+        media = post["media"]
+        video_url = media["video_url"]
+        dash_audio_url = None
+        manifest_read = False
+        probe = None
+
+        if media["dash_url"]:
+            # One manifest request gives every rendition, the duration and the audio track
+            with timed("dash_probe"):
+                manifest = dash_manifest.fetch_manifest(media["dash_url"])
+            best_video, _ = dash_manifest.pick_best(manifest.representations)
+            if best_video:
+                manifest_read = True
+                video_url = best_video.url
+            elif video_url:
+                logging.warning(f"dashUrl failed for {post['id']}, using fallback_url.")
+
+        prepared["original_media_url"] = video_url
+        if not video_url or post["is_self"]:
+            return
+
+        # Decide before downloading anything whether Reddit will take this video
+        with timed("dash_probe"):
+            if manifest_read:
+                probe = media_probe.probe_manifest(manifest, want_audio=media["has_audio"] and not media["is_gif"])
+                video_url = probe["video_url"]
+                dash_audio_url = probe["audio_url"]
+            else:
+                probe = media_probe.probe_url(video_url)
+        prepared["upload_note"] = media_probe.describe(probe)
+        if probe["decision"] == media_probe.LINK_POST:
+            prepared["audio_url"] = dash_audio_url
+            logging.info(f"Skipping video upload for {post['id']}: {probe['reason']}")
+            return
+
+        hash_source = video_hash_source(manifest if manifest_read else None, video_url)
+        if self.check_duplicate(post, prepared, "video", [hash_source]):
+            return
+
+        merged_file = job.path("merged_video.mp4")
+        video_file_name = "media_video.mp4"
+
+        if media["has_audio"] and not media["is_gif"]:
+            if manifest_read:
+                # Manifest lists the real audio track (None if the video is silent)
+                audio_url = dash_audio_url
+            else:
+                audio_url = get_audio_url_from_fallback(video_url)
+            prepared["audio_url"] = audio_url
+            logging.debug(f"Built audio_url: {audio_url} for post {post['id']}")
+            if audio_url:
+                # Merge directly from URLs, several posts can be merging at once
+                try:
+                    with timed("merge"):
+                        prepared["media_url"] = self.merge_media(video_url, audio_url, merged_file)
+                    return
+                except subprocess.CalledProcessError as e:
+                    logging.error(f"FFmpeg failed (URL merge) with return code {e.returncode}, falling back to video only. {post['id']}")
+        with timed("download"):
+            prepared["media_url"] = self.download_media(video_url, video_file_name, job.dir)
+
+    def prepare_media(self, post):
+        """Everything the submit stage needs for one post, in a dict with the post's MediaJob."""
+        media = post["media"]
+        job = MediaJob(self.media_dir, post["id"])
+        prepared = {
+            "gallery_images": [],
+            "media_url": None,
+            "original_media_url": media["original_media_url"],
+            "audio_url": None,
+            "upload_note": None,
+            "fingerprint": None,  # (kind, perceptual hashes) once the media is hashed
+            "duplicate_of": None,  # State row of the earlier post this one repeats
+            "job": job
+        }
+        with traced(post):
+            try:
+                if media["type"] == "gallery" and not post["is_self"]:
+                    prepared["gallery_images"] = self.prepare_gallery(post, job)
+                    self.check_duplicate(post, prepared, "image", [path for path in prepared["gallery_images"] if is_image(path)])
+                elif media["type"] == "video":
+                    self.prepare_video(post, prepared, job)
+                elif media["type"] == "image":
+                    file_name = media["image_url"].split('/')[-1]
+                    with timed("download"):
+                        prepared["media_url"] = self.download_media(media["image_url"], file_name, job.dir)
+                    if prepared["media_url"] and is_image(prepared["media_url"]):
+                        self.check_duplicate(post, prepared, "image", [prepared["media_url"]])
+            except Exception as e:
+                logging.error(f"Media preparation failed for post {post['id']}: {str(e)}")
+        return prepared
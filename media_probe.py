@@ -0,0 +1,100 @@
+import logging
+import http_client  # Shared pooled HTTP session
+import dash_manifest  # DASHPlaylist.mpd parser
+
+# Reddit's limits for uploaded video posts
+MAX_VIDEO_BYTES = 1024 ** 3
+MAX_VIDEO_SECONDS = 15 * 60
+
+# Pre-flight decisions
+UPLOAD_AS_IS = "upload"
+LOWER_RENDITION = "lower_rendition"
+LINK_POST = "link"
+
+
+def content_length(url):
+    """Size in bytes from a HEAD request, or None if the server doesn't say."""
+    try:
+        response = http_client.head(url)
+        if response.status_code == 200 and response.headers.get("Content-Length"):
+            return int(response.headers["Content-Length"])
+    except Exception as e:
+        logging.warning(f"HEAD failed for {url}: {str(e)}")
+    return None
+
+
+def _estimated_size(representation, duration):
+    # bandwidth is bits per second, good enough to rank renditions without a request each
+    if representation.bandwidth and duration:
+        return int(representation.bandwidth * duration / 8)
+    return None
+
+
+def _size(representation, duration, lookup):
+    return lookup(representation.url) or _estimated_size(representation, duration)
+
+
+def _result(decision, video_url, audio_url, size, duration, height=None, reason=None):
+    return {
+        "decision": decision,
+        "video_url": video_url,
+        "audio_url": audio_url,
+        "size": size,
+        "duration": duration,
+        "height": height,
+        "reason": reason
+    }
+
+
+def probe_manifest(manifest, want_audio=True, sizes=None):
+    """
+    Decide up front whether a DASH video can be uploaded, using the MPD duration and
+    sizes (estimated from bandwidth, confirmed with HEAD Content-Length).
+    Walks down the renditions until one fits, otherwise falls back to a link post.
+    sizes maps URL -> Content-Length for callers that already fetched them (the async copier).
+    """
+    lookup = sizes.get if sizes is not None else content_length
+    duration = manifest.duration
+    videos = dash_manifest.videos_best_first(manifest.representations)
+    _, audio = dash_manifest.pick_best(manifest.representations)
+    audio = audio if want_audio else None
+    audio_url = audio.url if audio else None
+
+    if duration and duration > MAX_VIDEO_SECONDS:
+        return _result(LINK_POST, videos[0].url if videos else None, audio_url, None, duration,
+                       reason=f"video is {duration / 60:.1f} minutes, over Reddit's {MAX_VIDEO_SECONDS // 60} minute limit")
+
+    audio_size = (_size(audio, duration, lookup) or 0) if audio else 0
+    for index, video in enumerate(videos):
+        estimate = _estimated_size(video, duration)
+        if estimate is not None and estimate + audio_size > MAX_VIDEO_BYTES:
+            continue  # Clearly too big, don't spend a request on it
+        size = (lookup(video.url) or estimate or 0) + audio_size
+        if size <= MAX_VIDEO_BYTES:
+            decision = UPLOAD_AS_IS if index == 0 else LOWER_RENDITION
+            return _result(decision, video.url, audio_url, size, duration, height=video.height)
+
+    return _result(LINK_POST, videos[0].url if videos else None, audio_url, None, duration,
+                   reason=f"every rendition is over Reddit's {MAX_VIDEO_BYTES // 1024 ** 3} GB upload limit")
+
+
+def probe_url(video_url, size=None):
+    """Fallback probe when there's no manifest, only the size of the single file is known."""
+    if size is None:
+        size = content_length(video_url)
+    if size and size > MAX_VIDEO_BYTES:
+        return _result(LINK_POST, video_url, None, size, None,
+                       reason=f"video is {size / 1024 ** 2:.0f} MB, over Reddit's upload limit")
+    return _result(UPLOAD_AS_IS, video_url, None, size, None)
+
+
+def describe(probe):
+    """One line for the archive comment explaining how the video was handled."""
+    if not probe:
+        return None
+    size = f" ({probe['size'] / 1024 ** 2:.1f} MB)" if probe["size"] else ""
+    if probe["decision"] == LOWER_RENDITION:
+        return f"Uploaded a lower {probe['height']}p rendition{size} to fit Reddit's upload limits."
+    if probe["decision"] == LINK_POST:
+        return f"Archived as a link post, {probe['reason']}."
+    return None
@@ -0,0 +1,127 @@
+import logging
+
+# File extensions treated as a direct image link
+IMAGE_EXTENSIONS = ('jpg', 'jpeg', 'png', 'gif')
+
+
+def _reddit_video_fallback(submission):
+    if submission.media and 'reddit_video' in submission.media:
+        return submission.media['reddit_video'].get('fallback_url')
+    return None
+
+
+def resolve_gallery_item(submission, media_id, meta):
+    """
+    Work out where a single gallery item lives. Returns a dict with either a direct
+    url or a dash_url (resolved from the manifest later), or None to skip the item.
+    """
+    # SKIP failed or invalid gallery items
+    if meta.get("status") != "valid":
+        logging.warning(f"Skipping failed gallery item {media_id} in post {submission.id}")
+        return None
+
+    item = {"media_id": media_id, "url": None, "dash_url": None, "fallback_url": None}
+
+    if meta.get('e') == 'Image' and 's' in meta and 'u' in meta['s']:
+        # Standard image
+        item["url"] = meta['s']['u'].split('?')[0]
+
+    elif meta.get('e') == 'AnimatedImage' and 's' in meta:
+        # Handle GIFs or MP4s
+        if 'gif' in meta['s']:
+            item["url"] = meta['s']['gif']
+        elif 'mp4' in meta['s']:
+            item["url"] = meta['s']['mp4']
+
+    elif meta.get('e') == 'RedditVideo':
+        # Handle Reddit-hosted videos in galleries (rare)
+        item["dash_url"] = meta.get('dashUrl')
+        # Fallback to reddit_video object if available
+        item["fallback_url"] = _reddit_video_fallback(submission)
+
+    if not (item["url"] or item["dash_url"] or item["fallback_url"]):
+        return None
+    return item
+
+
+def resolve_media(submission):
+    """
+    Decide how a submission's media should be fetched without touching the network.
+    Returns a plain dict so the download stage never has to read PRAW objects.
+    """
+    media = {
+        "type": "link",
+        "gallery_items": [],
+        "video_url": None,
+        "dash_url": None,
+        "has_audio": False,
+        "is_gif": False,
+        "image_url": None,
+        "original_media_url": None
+    }
+
+    # Read through vars(): on a lazy listing Submission hasattr/getattr of a missing attribute
+    # makes PRAW fetch the whole post, and listings leave is_gallery out for non-galleries
+    attributes = vars(submission)
+
+    # If image gallery
+    if attributes.get("is_gallery"):
+        media["type"] = "gallery"
+        for item in submission.gallery_data['items']:
+            media_id = item['media_id']
+            meta = submission.media_metadata.get(media_id, {})
+            resolved = resolve_gallery_item(submission, media_id, meta)
+            if resolved:
+                media["gallery_items"].append(resolved)
+
+    # Handle Reddit video from media_metadata (gallery-like or crossposted video posts)
+    elif attributes.get("media_metadata"):
+        for key, meta in attributes["media_metadata"].items():
+            if meta.get('e') == 'RedditVideo' and 'dashUrl' in meta:
+                media["type"] = "video"
+                media["dash_url"] = meta['dashUrl']
+                logging.info(f"Found dash_url: {media['dash_url']} for post {submission.id}")
+                # Fallback to submission.media.reddit_video.fallback_url if dashUrl fails
+                media["video_url"] = _reddit_video_fallback(submission)
+                media["has_audio"] = True
+                media["is_gif"] = meta.get('isGif', False)
+                break
+
+    # Handle direct Reddit video (fallback_url)
+    elif submission.media and 'reddit_video' in submission.media:
+        reddit_video = submission.media['reddit_video']
+        media["type"] = "video"
+        media["video_url"] = reddit_video.get('fallback_url')
+        media["has_audio"] = reddit_video.get('has_audio', False)
+        media["is_gif"] = reddit_video.get('is_gif', False)
+        media["dash_url"] = reddit_video.get('dash_url') or reddit_video.get('dashUrl')
+        media["original_media_url"] = media["video_url"]
+        logging.info(f"[DEBUG] dash_url from reddit_video: {media['dash_url']} for post {submission.id}")
+
+    # Handle direct image
+    elif not submission.is_self and submission.url.endswith(IMAGE_EXTENSIONS):
+        media["type"] = "image"
+        media["image_url"] = submission.url
+        media["original_media_url"] = submission.url
+
+    return media
+
+
+def snapshot_submission(submission):
+    """
+    Copy everything the archive needs from a source submission into a plain dict,
+    so later stages can run on other threads without sharing the source PRAW session.
+    """
+    return {
+        "id": submission.id,
+        "title": submission.title,
+        "url": submission.url,
+        "permalink": submission.permalink,
+        "author": str(submission.author),
+        "created_utc": submission.created_utc,
+        "is_self": submission.is_self,
+        "selftext": submission.selftext,
+        "link_flair_text": submission.link_flair_text,
+        "link_flair_template_id": getattr(submission, 'link_flair_template_id', None),
+        "media": resolve_media(submission)
+    }
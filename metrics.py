@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds. Stages run from a few ms (flair) to minutes (large merges)
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# Seconds from the source post being made to its archive copy, cron runs every ~15 minutes
+LATENCY_BUCKETS = (60, 300, 600, 900, 1200, 1800, 2700, 3600, 7200, 21600, 86400)
+
+# State store key the cumulative counters are kept under between cron runs, per script
+META_KEY = "metrics_{script}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, registry, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = registry.lock
+        self._values = {}
+        registry.metrics.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _label_pairs(self, key, constant_labels, extra=()):
+        return list(constant_labels) + list(zip(self.labelnames, key)) + list(extra)
+
+    def samples(self, constant_labels):
+        for key, value in sorted(self._values.items()):
+            yield self.name, self._label_pairs(key, constant_labels), value
+
+    def dump(self):
+        return [[list(key), value] for key, value in self._values.items()]
+
+    def restore(self, entries):
+        for key, value in entries:
+            self._values[tuple(key)] = value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, registry, name, help_text, labelnames=()):
+        super().__init__(registry, name, help_text, labelnames)
+        if not self.labelnames:
+            self._values[()] = 0  # Export 0 rather than nothing until the first increment
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help_text, labelnames=(), buckets=DURATION_BUCKETS):
+        super().__init__(registry, name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # [count per bucket (non-cumulative, last one is +Inf), sum]
+            entry = self._values.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0])
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+
+    def samples(self, constant_labels):
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield self.name + "_bucket", self._label_pairs(key, constant_labels, [("le", _format_value(bound))]), cumulative
+            yield self.name + "_sum", self._label_pairs(key, constant_labels), total
+            yield self.name + "_count", self._label_pairs(key, constant_labels), cumulative
+
+    def restore(self, entries):
+        for key, (counts, total) in entries:
+            # Bucket layout changed since they were saved, start over rather than mislabel them
+            if len(counts) == len(self.buckets) + 1:
+                self._values[tuple(key)] = [counts, total]
+
+
+class Registry:
+    """
+    The handful of metrics both scripts share, rendered in the Prometheus text format.
+    Every sample carries script="..." so the copier and the flair checker can sit in the
+    same node-exporter textfile directory without clashing.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = []
+        self.script = None
+
+    def render(self):
+        constant_labels = [("script", self.script)] if self.script else []
+        lines = []
+        with self.lock:
+            for metric in self.metrics:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                for name, labels, value in metric.samples(constant_labels):
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self):
+        """Counters and histograms as JSON, gauges are rewritten every run."""
+        with self.lock:
+            return json.dumps({metric.name: metric.dump() for metric in self.metrics if metric.kind != "gauge"})
+
+    def restore(self, data):
+        saved = json.loads(data)
+        with self.lock:
+            for metric in self.metrics:
+                if metric.name in saved:
+                    metric.restore(saved[metric.name])
+
+
+REGISTRY = Registry()
+
+POSTS = Counter(REGISTRY, "archiver_posts_total", "Posts the copier finished with, by outcome.", ["status"])
+ARCHIVE_LATENCY = Histogram(REGISTRY, "archiver_archive_latency_seconds",
+                            "Seconds from the source post being made to its archive copy.", buckets=LATENCY_BUCKETS)
+STAGE_DURATION = Histogram(REGISTRY, "archiver_stage_duration_seconds", "Seconds spent in each pipeline stage.", ["stage"])
+MEDIA_BYTES = Counter(REGISTRY, "archiver_media_bytes_total",
+                      "Media bytes fetched, by where they came from (download, merge or cache).", ["source"])
+FFMPEG_FAILURES = Counter(REGISTRY, "archiver_ffmpeg_failures_total", "ffmpeg runs that failed or timed out.")
+API_CALLS = Counter(REGISTRY, "archiver_api_calls_total", "Reddit API requests made, by account.", ["account"])
+REMOVAL_CHECKS = Counter(REGISTRY, "archiver_removal_checks_total", "Original posts checked for removal, by result.", ["result"])
+LAST_RUN = Gauge(REGISTRY, "archiver_last_run_timestamp_seconds", "When the script last finished a run (daemon: last flush).")
+RUN_DURATION = Gauge(REGISTRY, "archiver_run_duration_seconds", "How long the last run took.")
+
+_run_started = None
+
+
+def counting_requestor(base_class, account):
+    """
+    prawcore/asyncprawcore Requestor subclass that counts every request for account. Pass it to
+    praw.Reddit(requestor_class=...); token refreshes count too, they use the same budget.
+    """
+    class CountingRequestor(base_class):
+        def request(self, *args, **kwargs):
+            API_CALLS.inc(account=account)
+            return super().request(*args, **kwargs)
+
+    return CountingRequestor
+
+
+def record_post(post, status):
+    POSTS.inc(status=status)
+    if status == "archived" and post.get("created_utc"):
+        ARCHIVE_LATENCY.observe(max(time.time() - post["created_utc"], 0))
+
+
+def start_run(script, state_store):
+    """Name this process's samples and carry the counters on from the last run."""
+    global _run_started
+    _run_started = time.time()
+    REGISTRY.script = script
+    try:
+        saved = state_store.get_meta(META_KEY.format(script=script))
+        if saved:
+            REGISTRY.restore(saved)
+    except Exception as e:
+        logging.error(f"Failed to restore metrics: {str(e)}")
+
+
+def write_textfile(path):
+    # node-exporter may read the file at any moment, so swap it in whole
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        f.write(REGISTRY.render())
+    os.replace(temp_path, path)
+
+
+def flush(path, state_store):
+    """Save the counters for the next run and write the textfile. Never fails the caller."""
+    now = time.time()
+    LAST_RUN.set(now)
+    if _run_started:
+        RUN_DURATION.set(round(now - _run_started, 3))
+    try:
+        state_store.set_meta(META_KEY.format(script=REGISTRY.script), REGISTRY.dump())
+        write_textfile(path)
+    except Exception as e:
+        logging.error(f"Failed to write metrics to {path}: {str(e)}")
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every 15s would flood the logs
+
+
+def serve(port, host="127.0.0.1"):
+    """Serve /metrics from a background thread until the process exits."""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logging.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,59 @@
+import time
+import asyncio
+import threading
+import logging
+
+# Requests to keep in hand before we start waiting for the window to reset
+RESERVE_REQUESTS = 10
+
+# Reddit's rate limit window, used when the session doesn't expose a reset time
+WINDOW_SECONDS = 600
+
+
+class RedditRateLimiter:
+    """
+    Token bucket fed by Reddit's X-Ratelimit-Remaining / X-Ratelimit-Reset headers.
+
+    prawcore records those headers on every response (reddit.auth.limits), so the bucket
+    holds whatever the server says is left in the current window. Calls go straight
+    through while every session has budget and only block once one of them drops to
+    the reserve, until that session's window resets.
+    """
+    def __init__(self, *reddits, reserve=RESERVE_REQUESTS):
+        self.reddits = reddits
+        self.reserve = reserve
+        self._lock = threading.Lock()
+
+    def _seconds_to_reset(self, limits):
+        reset_timestamp = limits.get("reset_timestamp")
+        if reset_timestamp:
+            return reset_timestamp - time.time()
+        # Newer prawcore drops the reset time; windows are aligned to the clock
+        return WINDOW_SECONDS - (time.time() % WINDOW_SECONDS)
+
+    def _delay(self, cost):
+        delay = 0
+        for reddit in self.reddits:
+            limits = reddit.auth.limits
+            remaining = limits.get("remaining")
+            if remaining is None:
+                # No response seen yet on this session, nothing to go on
+                continue
+            if remaining - cost < self.reserve:
+                delay = max(delay, self._seconds_to_reset(limits))
+        if delay > 0:
+            logging.warning(f"Reddit API budget nearly used up, waiting {delay:.1f}s for the rate limit window to reset.")
+        return min(delay, WINDOW_SECONDS)
+
+    def wait(self, cost=1):
+        """Block only if spending cost more requests would dig into the reserve."""
+        with self._lock:
+            delay = self._delay(cost)
+            if delay > 0:
+                time.sleep(delay)
+
+    async def wait_async(self, cost=1):
+        """wait() for asyncpraw sessions, sleeps without blocking the event loop."""
+        delay = self._delay(cost)
+        if delay > 0:
+            await asyncio.sleep(delay)
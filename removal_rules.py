@@ -0,0 +1,62 @@
+import os
+import json
+import logging
+from collections import namedtuple
+import settings  # Optional config.py values
+
+# Rule table shipped with the repo. Point removal_rules_file in config.py at your own copy for another subreddit
+RULES_FILE = settings.get("removal_rules_file",
+                     os.path.join(os.path.dirname(os.path.abspath(__file__)), "removal_rules.json"))
+
+RemovalRules = namedtuple("RemovalRules", [
+    "flair_texts",       # frozenset of removal flair texts
+    "flair_ids",         # frozenset of removal flair template IDs
+    "selftext_markers",  # frozenset of selftexts Reddit leaves on deleted/removed posts
+    "by_category",       # any removed_by_category counts as removed
+    "missing_author"     # a deleted or suspended author counts as removed
+])
+
+
+def load_rules(path=RULES_FILE):
+    """Read the rule table once into frozensets."""
+    with open(path, "r") as f:
+        data = json.load(f)
+    flairs = data.get("removal_flairs", [])
+    rules = RemovalRules(
+        flair_texts=frozenset(flair["text"] for flair in flairs if flair.get("text")),
+        flair_ids=frozenset(flair["id"] for flair in flairs if flair.get("id")),
+        selftext_markers=frozenset(data.get("removed_selftext_markers", ["[deleted]", "[removed]"])),
+        by_category=bool(data.get("removed_by_category", True)),
+        missing_author=bool(data.get("missing_author", True))
+    )
+    logging.info(f"Loaded {len(flairs)} removal flairs from {path}")
+    return rules
+
+
+def compile_predicate(rules):
+    """
+    Build is_removed(submission) for a rule table. Every check runs in one expression over
+    locals bound here, and disabled checks are constant False, so a post costs a handful
+    of attribute reads and frozenset lookups.
+    """
+    flair_texts = rules.flair_texts
+    flair_ids = rules.flair_ids
+    markers = rules.selftext_markers
+    by_category = rules.by_category
+    missing_author = rules.missing_author
+
+    def is_removed(submission):
+        return (
+            (by_category and submission.removed_by_category is not None) or
+            submission.selftext in markers or
+            submission.link_flair_text in flair_texts or
+            getattr(submission, "link_flair_template_id", None) in flair_ids or
+            (missing_author and not submission.author)
+        )
+
+    return is_removed
+
+
+def removed_ids(is_removed, submissions):
+    """Batch path for /api/info results: one pass over the batch, returns the IDs that count as removed."""
+    return {submission.id for submission in submissions if is_removed(submission)}
@@ -0,0 +1,19 @@
+"""
+Optional values from config.py.
+
+config.py holds the Reddit credentials, and can also override tuning values and paths. Modules
+that only need those read them from here, so they still import without a config.py (e.g.
+benchmarks run without credentials) and fall back to their defaults.
+"""
+try:
+    import config  # Optional overrides live next to the credentials
+except ImportError:
+    config = None  # Defaults apply
+
+# Folder for state, logs, caches and temp media. Set archive_dir in config.py to run from somewhere else
+ARCHIVE_DIR = getattr(config, "archive_dir", "/home/ubuntu/Reddit-UFOs_Archive")
+
+
+def get(name, default=None):
+    """config.<name> if config.py sets it, otherwise default."""
+    return getattr(config, name, default)
@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from settings import ARCHIVE_DIR
+
+# Shared state database for the copier, single-post copier and removal checker
+STATE_DB = os.path.join(ARCHIVE_DIR, "archive_state.db")
+
+# Statuses a source post can be in
+STATUS_ARCHIVED = "archived"
+STATUS_REMOVED = "removed"
+STATUS_DUPLICATE = "duplicate"  # Skipped as a near-duplicate of an earlier post
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    source_id TEXT PRIMARY KEY,
+    archive_id TEXT,
+    media_urls TEXT,
+    flair_text TEXT,
+    flair_id TEXT,
+    source_created_utc REAL,
+    archived_utc REAL,
+    updated_utc REAL,
+    status TEXT NOT NULL,
+    last_checked_utc REAL,
+    next_check_utc REAL,
+    check_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS media_hashes (
+    source_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (source_id, kind, position)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Indexes on columns that older databases only get through _migrate()
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_posts_archive_id ON posts (archive_id);
+CREATE INDEX IF NOT EXISTS idx_posts_status ON posts (status, archived_utc);
+CREATE INDEX IF NOT EXISTS idx_posts_next_check ON posts (status, next_check_utc);
+"""
+
+# Columns added after the first release, with their definitions
+ADDED_COLUMNS = {
+    "last_checked_utc": "REAL",
+    "next_check_utc": "REAL",
+    "check_count": "INTEGER NOT NULL DEFAULT 0"
+}
+
+
+class StateStore:
+    """
+    SQLite (WAL mode) record of every post we've archived. Lookups hit the primary key
+    or the archive_id index, writes touch a single row, nothing is ever trimmed.
+    Safe to share between the threads of one process and between overlapping cron runs.
+    """
+    def __init__(self, path=STATE_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self._lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(SCHEMA)
+            self._migrate()
+            self.conn.executescript(INDEXES)
+
+    def _migrate(self):
+        existing = {row["name"] for row in self.conn.execute("PRAGMA table_info(posts)")}
+        for column, definition in ADDED_COLUMNS.items():
+            if column not in existing:
+                self.conn.execute(f"ALTER TABLE posts ADD COLUMN {column} {definition}")
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    # --- posts ---
+
+    def is_processed(self, source_id):
+        with self._lock:
+            row = self.conn.execute("SELECT 1 FROM posts WHERE source_id = ?", (source_id,)).fetchone()
+        return row is not None
+
+    def get_post(self, source_id):
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM posts WHERE source_id = ?", (source_id,)).fetchone()
+        return dict(row) if row else None
+
+    def record_archived(self, source_id, archive_id=None, media_urls=None, flair_text=None,
+                        flair_id=None, source_created_utc=None, status=STATUS_ARCHIVED):
+        now = time.time()
+        media_json = json.dumps([url for url in (media_urls or []) if url])
+        with self._lock, self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO posts (source_id, archive_id, media_urls, flair_text, flair_id,
+                                   source_created_utc, archived_utc, updated_utc, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(source_id) DO UPDATE SET
+                    archive_id = COALESCE(excluded.archive_id, posts.archive_id),
+                    media_urls = excluded.media_urls,
+                    flair_text = excluded.flair_text,
+                    flair_id = excluded.flair_id,
+                    source_created_utc = COALESCE(excluded.source_created_utc, posts.source_created_utc),
+                    updated_utc = excluded.updated_utc,
+                    status = excluded.status
+                """,
+                (source_id, archive_id, media_json, flair_text, flair_id,
+                 source_created_utc, now, now, status)
+            )
+
+    def get_source_id(self, archive_id):
+        """Source post ID for an archived post, via the archive_id index."""
+        with self._lock:
+            row = self.conn.execute("SELECT source_id FROM posts WHERE archive_id = ?", (archive_id,)).fetchone()
+        return row["source_id"] if row else None
+
+    def link_archive(self, source_id, archive_id, source_created_utc=None):
+        """Backfill the source -> archive mapping for posts archived before it was recorded."""
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO posts (source_id, archive_id, source_created_utc, archived_utc, updated_utc, status)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(source_id) DO UPDATE SET
+                    archive_id = excluded.archive_id,
+                    source_created_utc = COALESCE(excluded.source_created_utc, posts.source_created_utc),
+                    updated_utc = excluded.updated_utc
+                """,
+                (source_id, archive_id, source_created_utc, now, now, STATUS_ARCHIVED)
+            )
+
+    def set_status(self, source_id, status):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE posts SET status = ?, updated_utc = ? WHERE source_id = ?",
+                (status, time.time(), source_id)
+            )
+
+    # --- removal rechecks ---
+
+    def due_for_check(self, now, max_age):
+        """Archived posts younger than max_age seconds whose next removal check is due, oldest check first."""
+        with self._lock:
+            rows = self.conn.execute(
+                """
+                SELECT source_id, archive_id, COALESCE(source_created_utc, archived_utc) AS created_utc,
+                       last_checked_utc, check_count
+                FROM posts
+                WHERE status = ? AND archive_id IS NOT NULL
+                  AND COALESCE(source_created_utc, archived_utc) >= ?
+                  AND (next_check_utc IS NULL OR next_check_utc <= ?)
+                ORDER BY next_check_utc
+                """,
+                (STATUS_ARCHIVED, now - max_age, now)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def record_check(self, source_id, next_check_utc):
+        """Note a removal check; next_check_utc None means don't check again."""
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                """
+                UPDATE posts SET last_checked_utc = ?, next_check_utc = ?, check_count = check_count + 1
+                WHERE source_id = ?
+                """,
+                (now, next_check_utc, source_id)
+            )
+
+    # --- perceptual hashes of archived media ---
+
+    def add_media_hashes(self, source_id, kind, hashes):
+        """Store a post's perceptual hashes (64-bit ints) for duplicate detection."""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM media_hashes WHERE source_id = ? AND kind = ?", (source_id, kind))
+            self.conn.executemany(
+                "INSERT INTO media_hashes (source_id, kind, position, hash) VALUES (?, ?, ?, ?)",
+                [(source_id, kind, position, f"{value:016x}") for position, value in enumerate(hashes)]
+            )
+
+    def iter_media_hashes(self):
+        """Every stored hash as (source_id, kind, hash)."""
+        with self._lock:
+            rows = self.conn.execute("SELECT source_id, kind, hash FROM media_hashes").fetchall()
+        return [(row["source_id"], row["kind"], int(row["hash"], 16)) for row in rows]
+
+    # --- meta (cursors, one-off flags) ---
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else default
+
+    def set_meta(self, key, value):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value)
+            )
+
+    def import_processed_file(self, processed_file):
+        """One-time import of the old processed_posts.txt so nothing gets copied twice after upgrading."""
+        if self.get_meta("imported_processed_file") or not os.path.exists(processed_file):
+            return 0
+        with open(processed_file, "r") as f:
+            ids = [line.strip() for line in f if line.strip()]
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO posts (source_id, archived_utc, updated_utc, status) VALUES (?, ?, ?, ?)",
+                [(post_id, now, now, STATUS_ARCHIVED) for post_id in ids]
+            )
+        self.set_meta("imported_processed_file", processed_file)
+        logging.info(f"Imported {len(ids)} post IDs from {processed_file}")
+        return len(ids)
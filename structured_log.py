@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import uuid
+import logging
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+import metrics
+import settings  # Optional config.py values
+
+# Levels, from the environment first so they can be changed per run: ARCHIVE_LOG_LEVEL=DEBUG python3 ...
+JSON_LOG_LEVEL = os.environ.get("ARCHIVE_LOG_LEVEL") or settings.get("log_level", "INFO")
+ERROR_LOG_LEVEL = os.environ.get("ARCHIVE_ERROR_LOG_LEVEL") or settings.get("error_log_level", "ERROR")
+
+# JSON log rotation, the human-readable error log is left to the Discord forwarder
+JSON_LOG_MAX_BYTES = 20 * 1024 * 1024
+JSON_LOG_BACKUPS = 5
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s: %(message)s'
+
+# Submission being worked on in this thread/task, stamped onto every record
+_trace = contextvars.ContextVar("trace", default=None)
+
+# Fields a record can carry through extra={...} into the JSON line
+EVENT_FIELDS = ("event", "stage", "duration_ms", "status", "timings", "bytes", "count")
+
+
+class TraceFilter(logging.Filter):
+    def filter(self, record):
+        trace = _trace.get()
+        record.trace_id = trace["trace_id"] if trace else None
+        record.post_id = trace["post_id"] if trace else None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, trace and any event fields."""
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage()
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+            entry["post_id"] = record.post_id
+        for field in EVENT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def setup_logging(error_log, json_log=None):
+    """
+    Human-readable errors go to error_log as before (forwarded to Discord); with json_log set,
+    everything at JSON_LOG_LEVEL and up also goes there as JSON lines with trace IDs.
+    """
+    root = logging.getLogger()
+    trace_filter = TraceFilter()
+
+    error_handler = logging.FileHandler(error_log)
+    error_handler.setLevel(ERROR_LOG_LEVEL)
+    error_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    error_handler.addFilter(trace_filter)
+    root.addHandler(error_handler)
+    levels = [error_handler.level]
+
+    if json_log:
+        json_handler = RotatingFileHandler(json_log, maxBytes=JSON_LOG_MAX_BYTES, backupCount=JSON_LOG_BACKUPS)
+        json_handler.setLevel(JSON_LOG_LEVEL)
+        json_handler.setFormatter(JsonFormatter())
+        json_handler.addFilter(trace_filter)
+        root.addHandler(json_handler)
+        levels.append(json_handler.level)
+
+    root.setLevel(min(levels))
+    # Their per-request debug chatter would drown ours
+    for noisy in ("urllib3", "prawcore", "asyncprawcore"):
+        logging.getLogger(noisy).setLevel(max(logging.INFO, root.level))
+
+
+def new_trace_id():
+    return uuid.uuid4().hex[:12]
+
+
+def start_trace(post):
+    """Give a post snapshot its trace ID (kept across retries) and a fresh set of stage timings."""
+    post.setdefault("trace_id", new_trace_id())
+    post["timings"] = {}
+    post["trace_started"] = time.time()
+    return post
+
+
+@contextmanager
+def traced(post):
+    """Tag every record logged inside the block with the post's trace ID, and collect its stage timings."""
+    token = _trace.set({"trace_id": post.get("trace_id"), "post_id": post.get("id"), "timings": post.get("timings")})
+    try:
+        yield
+    finally:
+        _trace.reset(token)
+
+
+@contextmanager
+def timed(stage, **fields):
+    """
+    Log how long the block took as a "stage" event. Inside traced() the duration is also
+    added to the post's timings, so a stage that runs twice (retries, chunks) is summed.
+    """
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        duration_ms = round((time.perf_counter() - start) * 1000, 1)
+        trace = _trace.get()
+        if trace and trace["timings"] is not None:
+            trace["timings"][stage] = round(trace["timings"].get(stage, 0) + duration_ms, 1)
+        metrics.STAGE_DURATION.observe(duration_ms / 1000, stage=stage)
+        logging.info(f"{stage} took {duration_ms} ms", extra=dict(fields, event="stage", stage=stage,
+                                                                   duration_ms=duration_ms, status=status))
+
+
+def finish_trace(post, status):
+    """One summary line per post: outcome, time since it was listed and the per-stage totals."""
+    total_ms = round((time.time() - post.get("trace_started", time.time())) * 1000, 1)
+    metrics.record_post(post, status)
+    logging.info(f"Post {post.get('id')} {status} in {total_ms} ms",
+                 extra={"event": "post", "status": status, "duration_ms": total_ms, "timings": post.get("timings")})
+
+
+def log_event(event, message, **fields):
+    logging.info(message, extra=dict(fields, event=event))